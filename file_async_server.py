@@ -0,0 +1,302 @@
+import asyncio
+import os
+import socket
+from file_metrics import MeteredStream, MeteredWriter
+from file_request import Request
+from file_framing import MAGIC, TERMINATOR, TEXT_STREAM_END, ReadBuffer, pack_response, text_response
+
+
+class AsyncSocketReader(ReadBuffer):
+    # padanan SocketReader untuk asyncio.StreamReader; parsing buffer ada di ReadBuffer, di sini hanya I/O
+    def __init__(self, stream, bufsize=1024 * 1024):
+        ReadBuffer.__init__(self)
+        self.stream = stream
+        self.bufsize = bufsize
+
+    async def _fill(self):
+        data = await self.stream.read(self.bufsize)
+        if not data:
+            return False
+        self.buffer += data
+        return True
+
+    async def _read(self, take, *args):
+        while True:
+            value = take(*args)
+            if value is not None:
+                return value
+            if not await self._fill():
+                return take(*args, eof=True)
+
+    async def read_exact(self, n):
+        return await self._read(self.take_exact, n)
+
+    async def peek(self, n):
+        return await self._read(self.take_peek, n)
+
+    async def read_token(self, separator=b" "):
+        return await self._read(self.take_token, separator)
+
+    async def read_frame(self):
+        return await self._read(self.take_frame)
+
+    async def read_upload_header(self):
+        return await self._read(self.take_upload_header)
+
+    async def read_until(self, delimiter=TERMINATOR):
+        return await self._read(self.take_until, delimiter)
+
+    async def iter_exact(self, n):
+        remaining = n
+        if self.buffer:
+            chunk = self.take_available(remaining)
+            remaining -= len(chunk)
+            yield chunk
+        while remaining > 0:
+            data = await self.stream.read(min(self.bufsize, remaining))
+            if not data:
+                raise ConnectionError(f"connection closed after {n - remaining} of {n} bytes")
+            remaining -= len(data)
+            yield data
+
+    async def iter_until(self, delimiter=TERMINATOR):
+        done = False
+        while not done:
+            chunk, done = await self._read(self.take_chunk_until, delimiter)
+            if chunk:
+                yield chunk
+
+
+class AsyncClientHandler:
+    def __init__(self, server, executor):
+        self.server = server
+        self.executor = executor
+        self.chunk_size = server.chunk_size
+
+    async def run_blocking(self, fn, *args):
+        # disk I/O dan base64 dijalankan di executor supaya event loop tidak terblokir
+        self.server.metrics.add("queued")
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._dequeued, fn, *args)
+
+    def _dequeued(self, fn, *args):
+        self.server.metrics.add("queued", -1)
+        return fn(*args)
+
+    async def handle(self, stream, writer):
+        metrics = self.server.metrics
+        metrics.add("connections_total")
+        metrics.add("connections_active")
+        addr = writer.get_extra_info("peername")
+        # asyncio hanya memasang TCP_NODELAY jika proto socket IPPROTO_TCP, socket hasil accept di sini proto 0
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer = MeteredWriter(writer, metrics)
+        reader = AsyncSocketReader(MeteredStream(stream, writer), self.chunk_size)
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.peek(len(MAGIC)), self.server.idle_timeout or None)
+                except asyncio.TimeoutError:
+                    break
+                if not head:
+                    break
+
+                writer.begin()
+                try:
+                    if head == MAGIC:
+                        keep_alive = await self.handle_binary(reader, writer, addr)
+                    else:
+                        keep_alive = await self.handle_text(reader, writer, addr)
+                finally:
+                    writer.end()
+                keep_alive = keep_alive and bool(self.server.idle_timeout)
+        except Exception as e:
+            print(f"[SERVER] General error with {addr}: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+            metrics.add("connections_active", -1)
+
+    async def handle_binary(self, reader, writer, addr):
+        header, payload_len = await reader.read_frame()
+        request = Request.parse(header.decode())
+        print(f"[SERVER] Binary request {request.command} ({payload_len} bytes payload) from {addr}")
+        writer.command = request.command
+
+        # mode asyncio selalu menjawab REDIRECT untuk request milik node lain (tidak diproxy)
+        node = self.server._route(request)
+        if node is not None:
+            await self._drain(reader.iter_exact(payload_len))
+            writer.write(pack_response(self.server._redirect(node, request)))
+            await writer.drain()
+            return True
+
+        if request.command in ("UPLOAD", "UPLOADAT"):
+            body = reader.iter_exact(payload_len)
+            try:
+                filename, offset = self.server._upload_target(request)
+                upload = await self._write_upload(filename, body, offset, None, request.encoding, request.checksum)
+                response = await self.run_blocking(self.server._finish_upload, request, filename, offset, upload)
+            except Exception as e:
+                print(f"[SERVER] Upload error: {e}")
+                await self._drain(body)
+                response = {"status": "ERROR", "data": f"Upload failed: {str(e)}"}
+
+        elif request.command == "GET":
+            try:
+                meta, _, f, offset, length = await self.run_blocking(self.server._prepare_get, request)
+            except Exception as e:
+                print(f"[SERVER] Download error: {e}")
+                response = {"status": "ERROR", "data": f"Download failed: {str(e)}"}
+            else:
+                try:
+                    writer.write(pack_response(self.server._tag(meta, request.request_id), length))
+                    await writer.drain()
+                    if length:
+                        await writer.sendfile(f, offset, length)
+                finally:
+                    f.close()
+                return True
+
+        elif request.command == "CLOSE":
+            writer.write(pack_response(self.server._tag({"status": "OK", "data": "connection closed"}, request.request_id)))
+            await writer.drain()
+            return False
+
+        else:
+            response = await self.run_blocking(self.server._run_command, request)
+
+        writer.write(pack_response(self.server._tag(response, request.request_id)))
+        await writer.drain()
+        return True
+
+    async def handle_text(self, reader, writer, addr):
+        request_id = None
+        if await reader.peek(1) == b"#":
+            request_id = (await reader.read_token())[1:].decode(errors="ignore")
+
+        if await reader.peek(len("UPLOAD")) == b"UPLOAD":
+            request = Request(" ".join(await reader.read_upload_header()), request_id)
+            writer.command = request.command
+            raw = reader.iter_until(TERMINATOR)
+            node = self.server._route(request)
+            if node is not None:
+                await self._drain(raw)
+                writer.write(text_response(self.server._redirect(node, request)))
+                await writer.drain()
+                return True
+            try:
+                filename, offset = self.server._upload_target(request)
+                upload = await self._write_upload(filename, raw, offset, self.server.transcoder.decoder(),
+                                                  request.encoding, request.checksum)
+                response = await self.run_blocking(self.server._finish_upload, request, filename, offset, upload)
+            except Exception as e:
+                print(f"[SERVER] Upload error: {e}")
+                await self._drain(raw)
+                response = {"status": "ERROR", "data": f"Upload failed: {str(e)}"}
+            print(f"[SERVER] Received {request.command} {request.filename} from {addr}")
+            writer.write(text_response(self.server._tag(response, request_id)))
+            await writer.drain()
+            return True
+
+        request = Request((await reader.read_until(TERMINATOR)).decode(errors="ignore"), request_id)
+        print(f"[SERVER] Received {len(request.command_str)} bytes from {addr}")
+        writer.command = request.command
+
+        node = self.server._route(request)
+        if node is not None:
+            writer.write(text_response(self.server._redirect(node, request)))
+            await writer.drain()
+            return True
+
+        if request.command == "GET":
+            try:
+                meta, encoded, f, offset, length = await self.run_blocking(self.server._prepare_get, request, True)
+            except Exception as e:
+                print(f"[SERVER] Download error: {e}")
+                response = {"status": "ERROR", "data": f"Download failed: {str(e)}"}
+            else:
+                prefix = self.server._text_stream_prefix(request_id, meta)
+                if encoded is not None:
+                    # writelines memakai sendmsg (scatter/gather) pada transport yang mendukungnya
+                    writer.writelines([prefix, encoded, TEXT_STREAM_END])
+                else:
+                    writer.write(prefix)
+                    step = self.chunk_size - self.chunk_size % 3 or 3
+                    try:
+                        remaining = length
+                        while remaining > 0:
+                            n = min(step, remaining)
+                            chunk = await self.run_blocking(self._read_encoded, f, n)
+                            if not chunk:
+                                break
+                            remaining -= n
+                            writer.write(chunk)
+                            await writer.drain()
+                    finally:
+                        f.close()
+                    writer.write(TEXT_STREAM_END)
+                await writer.drain()
+                return True
+
+        elif request.command == "CLOSE":
+            writer.write(text_response(self.server._tag({"status": "OK", "data": "connection closed"}, request_id)))
+            await writer.drain()
+            return False
+
+        else:
+            response = await self.run_blocking(self.server._run_command, request)
+
+        writer.write(text_response(self.server._tag(response, request_id)))
+        await writer.drain()
+        return True
+
+    async def _write_upload(self, filename, chunks, offset=None, decoder=None, encoding=(), expected=None):
+        upload = await self.run_blocking(self.server.storage.open_upload, filename, offset)
+        sidecar = None
+        try:
+            decoder, sidecar = self.server._upload_decoder(decoder, encoding, offset)
+            async for chunk in chunks:
+                await self.run_blocking(self.server._write_chunk, upload, chunk, decoder)
+            if decoder is not None:
+                await self.run_blocking(self.server._write_chunk, upload, None, decoder)
+            self.server._verify(upload, expected)
+            await self.run_blocking(self._commit, upload)
+        except BaseException:
+            upload.abort()
+            self.server._discard_sidecar(sidecar)
+            raise
+        finally:
+            self.server.cache.invalidate(upload.filepath)
+        await self.run_blocking(self.server._install_sidecar, filename, encoding, sidecar, upload)
+        return upload
+
+    def _commit(self, upload):
+        with self.server.metrics.phase("disk"):
+            return upload.commit()
+
+    def _read_encoded(self, f, size):
+        with self.server.metrics.phase("disk"):
+            data = f.read(size)
+        with self.server.metrics.phase("decode"):
+            return self.server.transcoder.encode(data)
+
+    async def _drain(self, chunks):
+        try:
+            async for _ in chunks:
+                pass
+        except Exception:
+            pass
+
+
+async def serve(server):
+    handler = AsyncClientHandler(server, server.pool)
+    server.sock.setblocking(False)
+    server.sock.listen(socket.SOMAXCONN)
+    aio_server = await asyncio.start_server(handler.handle, sock=server.sock)
+    print(f"[SERVER-ASYNCIO] Listening on port {server.port} with PID {os.getpid()}...")
+    async with aio_server:
+        await aio_server.serve_forever()
@@ -0,0 +1,259 @@
+import argparse
+import csv
+import json
+import logging
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+from file_connection_pool import ConnectionPool
+from file_stress_client import InteractiveStressTester
+
+# nilai t dua sisi 95% untuk derajat kebebasan 1..30; di atas itu didekati 1.96
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+DEFAULTS = {
+    'modes': ['thread'],
+    'workers': [5],
+    'file_sizes': [10],
+    'client_pools': [1, 5],
+    'operations': ['upload', 'download'],
+    'protocols': ['text'],
+    'executor': 'thread',
+    'connection': 'one-shot',
+    'segments': 1,
+    'iterations': 3,
+    'warmup': 1,
+    'port': 7777,
+    'threshold': 10.0,
+}
+
+# kolom yang dipakai untuk mencocokkan baris hasil dengan baseline (jika kolomnya ada di baseline)
+KEY_FIELDS = ['operation', 'file_size_mb', 'client_pool_size', 'server_pool_size', 'executor_type',
+              'server_mode', 'protocol', 'connection', 'segments']
+METRICS = ['avg_duration', 'median_duration', 'avg_throughput', 'aggregate_throughput']
+
+
+def confidence_interval(values: List[float]) -> float:
+    # setengah lebar interval kepercayaan 95% untuk rata-rata (distribusi t)
+    if len(values) < 2:
+        return 0.0
+    df = len(values) - 1
+    t = T_95[df - 1] if df <= len(T_95) else 1.96
+    return t * statistics.stdev(values) / math.sqrt(len(values))
+
+
+class ServerProcess:
+    # menjalankan file_stress_server.py di localhost untuk satu kombinasi mode/jumlah worker
+    def __init__(self, mode: str, workers: int, port: int, extra_args: Optional[List[str]] = None):
+        self.mode = mode
+        self.workers = workers
+        self.port = port
+        self.extra_args = extra_args or []
+        self.proc = None
+
+    def __enter__(self):
+        cmd = [sys.executable, 'file_stress_server.py', '--mode', self.mode, '--workers', str(self.workers),
+               '--port', str(self.port)] + self.extra_args
+        self.proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout: float = 15) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {self.proc.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"server not ready on port {self.port} after {timeout}s")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+class BenchmarkHarness:
+    def __init__(self, config: Dict):
+        self.config = config
+        self.tester = InteractiveStressTester()
+        self.tester.logger.setLevel(logging.WARNING)
+        self.tester.server_address = ('127.0.0.1', config['port'])
+        self.tester.segments = config['segments']
+        self.results = []
+
+    def run(self) -> List[Dict]:
+        for mode in self.config['modes']:
+            for workers in self.config['workers']:
+                print(f"\n=== Server: {mode} x {workers} ===")
+                with ServerProcess(mode, workers, self.config['port']):
+                    for protocol in self.config['protocols']:
+                        self.tester.protocol = protocol
+                        self._run_matrix(mode, workers)
+        return self.results
+
+    def _run_matrix(self, mode: str, workers: int) -> None:
+        for file_size in self.config['file_sizes']:
+            file_path = self.tester._generate_test_file(file_size)
+            for client_pool in self.config['client_pools']:
+                self._open_pool(client_pool)
+                try:
+                    for operation in self.config['operations']:
+                        if operation != 'upload' and not self.tester._ensure_file_exists(file_path):
+                            print(f"Skipping {operation} {file_size}MB: test file upload failed")
+                            continue
+                        row = self._measure(operation, file_path, file_size, client_pool, mode, workers)
+                        self.results.append(row)
+                        print(f"{operation:8} {file_size:>4}MB clients={client_pool:<3} {self.tester.protocol:6} "
+                              f"throughput={row['aggregate_throughput'] / 1024 / 1024:.2f}"
+                              f"±{row['aggregate_throughput_ci'] / 1024 / 1024:.2f} MB/s "
+                              f"ok={row['success_count']} fail={row['fail_count']}")
+                finally:
+                    self._close_pool()
+
+    def _open_pool(self, client_pool: int) -> None:
+        if self.config['connection'] == 'keep-alive':
+            self.tester.pool = ConnectionPool(self.tester.server_address, max_idle=client_pool * self.tester.segments, timeout=600)
+
+    def _close_pool(self) -> None:
+        if self.tester.pool is not None:
+            self.tester.pool.close()
+            self.tester.pool = None
+
+    def _measure(self, operation: str, file_path: str, file_size: int, client_pool: int, mode: str, workers: int) -> Dict:
+        # putaran warmup dibuang, tiap iterasi berikutnya menghasilkan satu sampel per metrik
+        executor = self.config['executor']
+        for _ in range(self.config['warmup']):
+            self.tester._run_round(operation, file_path, client_pool, executor)
+        samples = {metric: [] for metric in METRICS}
+        success = fail = 0
+        for _ in range(self.config['iterations']):
+            start = time.perf_counter()
+            results = self.tester._run_round(operation, file_path, client_pool, executor)
+            wall = time.perf_counter() - start
+            stats = self.tester._calculate_statistics(results, operation, file_size, client_pool, workers, executor)
+            success += stats['success_count']
+            fail += stats['fail_count']
+            stats['aggregate_throughput'] = sum(r['file_size'] for r in results if r['status'] == 'OK') / wall if wall > 0 else 0
+            for metric in METRICS:
+                samples[metric].append(stats[metric])
+        row = {
+            'operation': operation, 'file_size_mb': file_size, 'client_pool_size': client_pool,
+            'server_pool_size': workers, 'executor_type': executor, 'server_mode': mode,
+            'protocol': self.tester.protocol, 'connection': self.config['connection'],
+            'segments': self.tester.segments, 'iterations': self.config['iterations'],
+            'success_count': success, 'fail_count': fail,
+        }
+        for metric in METRICS:
+            row[metric] = statistics.mean(samples[metric]) if samples[metric] else 0
+            row[f"{metric}_ci"] = confidence_interval(samples[metric])
+        row['timestamp'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        return row
+
+
+def save_results(results: List[Dict], filename: Optional[str] = None) -> str:
+    filename = filename or f"bench_results_{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+    return filename
+
+
+def compare_baseline(results: List[Dict], baseline_path: str, threshold: float) -> List[Dict]:
+    # bandingkan avg_throughput dengan baris baseline yang cocok (misal stress_results_*.csv lama);
+    # regresi = turun lebih dari threshold persen dan lebih besar dari interval kepercayaan hasil baru
+    with open(baseline_path, newline='') as f:
+        baseline = list(csv.DictReader(f))
+    if not baseline:
+        return []
+    keys = [k for k in KEY_FIELDS if k in baseline[0]]
+    index = {tuple(str(row[k]) for k in keys): row for row in baseline}
+    comparisons = []
+    for row in results:
+        base = index.get(tuple(str(row[k]) for k in keys))
+        if base is None or not float(base['avg_throughput']):
+            continue
+        old = float(base['avg_throughput'])
+        new = row['avg_throughput']
+        change = (new - old) / old * 100
+        comparisons.append({
+            'key': {k: row[k] for k in keys}, 'baseline': old, 'current': new, 'change_pct': change,
+            'regression': change < -threshold and old - new > row['avg_throughput_ci'],
+        })
+    return comparisons
+
+
+def load_config(args) -> Dict:
+    config = dict(DEFAULTS)
+    if args.config:
+        with open(args.config) as f:
+            config.update(json.load(f))
+    for key in DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    return config
+
+
+def _list(cast):
+    return lambda text: [cast(v) for v in text.split(',') if v]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark file_stress_server tanpa input interaktif")
+    parser.add_argument("--config", help="file JSON berisi matriks (kunci sama dengan nama opsi, memakai underscore)")
+    parser.add_argument("--modes", type=_list(str), help="contoh thread,process,asyncio")
+    parser.add_argument("--workers", type=_list(int), help="jumlah worker server, contoh 1,5,50")
+    parser.add_argument("--file-sizes", dest="file_sizes", type=_list(int), help="ukuran file dalam MB, contoh 10,50")
+    parser.add_argument("--client-pools", dest="client_pools", type=_list(int), help="jumlah client bersamaan, contoh 1,5,50")
+    parser.add_argument("--operations", type=_list(str), help="upload,download")
+    parser.add_argument("--protocols", type=_list(str), help="text,binary")
+    parser.add_argument("--executor", choices=["thread", "process"])
+    parser.add_argument("--connection", choices=["one-shot", "keep-alive"])
+    parser.add_argument("--segments", type=int)
+    parser.add_argument("--iterations", type=int)
+    parser.add_argument("--warmup", type=int)
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--baseline", help="CSV hasil sebelumnya untuk deteksi regresi")
+    parser.add_argument("--threshold", type=float, help="batas penurunan throughput (persen) yang dianggap regresi")
+    parser.add_argument("--output", help="nama file CSV hasil")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config(args)
+    results = BenchmarkHarness(config).run()
+    if not results:
+        print("No results!")
+        return 1
+    print(f"\nResults saved to {save_results(results, args.output)}")
+    if not args.baseline:
+        return 0
+    regressions = 0
+    print(f"\n=== Comparison with {args.baseline} ===")
+    for c in compare_baseline(results, args.baseline, config['threshold']):
+        regressions += c['regression']
+        label = ' '.join(f"{v}" for v in c['key'].values())
+        print(f"{'REGRESSION' if c['regression'] else 'ok':10} {label}: "
+              f"{c['baseline'] / 1024 / 1024:.2f} -> {c['current'] / 1024 / 1024:.2f} MB/s ({c['change_pct']:+.1f}%)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
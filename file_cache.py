@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class ContentCache:
+    # cache LRU isi file (misal sudah di-base64) dengan batas total byte
+    # key: (path, mtime_ns, size, jenis); request bersamaan untuk key yang sama hanya memuat sekali
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.getenv("cache_bytes", str(256 * 1024 * 1024)))
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.paths = {}
+        self.inflight = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key_for(self, path, kind):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size, kind)
+
+    def fits(self, nbytes):
+        return 0 < nbytes <= self.max_bytes
+
+    def get_or_load(self, key, loader):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                self.inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        # file berubah selama dibaca: hasil tetap dikirim tapi tidak disimpan
+        current = self._is_current(key)
+        with self.lock:
+            self.inflight.pop(key, None)
+            if current:
+                self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _is_current(self, key):
+        try:
+            return self.key_for(key[0], key[3]) == key
+        except OSError:
+            return False
+
+    def _store(self, key, value):
+        nbytes = len(value)
+        if not self.fits(nbytes):
+            return
+        self.entries[key] = value
+        self.paths.setdefault(key[0], set()).add(key)
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            old_key, old_value = self.entries.popitem(last=False)
+            self._forget(old_key, old_value)
+            self.evictions += 1
+
+    def _forget(self, key, value):
+        self.size -= len(value)
+        keys = self.paths.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.paths[key[0]]
+
+    def invalidate(self, path):
+        path = os.path.abspath(path)
+        with self.lock:
+            for key in list(self.paths.get(path, ())):
+                self._forget(key, self.entries.pop(key))
+                self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, shared=self.shared,
+                        evictions=self.evictions, invalidations=self.invalidations,
+                        entries=len(self.entries), bytes=self.size, max_bytes=self.max_bytes)
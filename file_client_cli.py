@@ -1,48 +1,172 @@
+import os
 import socket
+import hashlib
 import json
 import base64
 import logging
+import threading
+from file_framing import SocketReader, pack_request, read_response
+from file_connection_pool import ConnectionPool
+from file_cluster import READ_COMMANDS, WRITE_COMMANDS, parse_node
+from file_segmented import SEGMENT_SIZE, parallel_download, parallel_upload
+from file_compression import compress_bytes, decompress_bytes, looks_compressible
 
 server_address = ('172.16.16.101', 6666)
+# True: pakai mode biner (header + payload mentah), False: protokol teks/JSON lama
+binary_mode = False
+# True: pakai ulang koneksi persistent dari pool, False: satu koneksi per perintah
+keep_alive = False
+# codec kompresi yang diminta untuk GET/UPLOAD (misal "zlib"), None = tanpa kompresi
+compression = None
+# file_cluster.Cluster dengan cluster_nodes yang sama dengan server (Cluster.from_env()); jika diisi,
+# perintah untuk satu file langsung dikirim ke node pemiliknya, None = semua ke server_address
+cluster = None
+# satu pool per alamat server (mode cluster memakai beberapa node sekaligus)
+connection_pools = {}
+
+def get_pool(address=None):
+    address = address or server_address
+    if address not in connection_pools:
+        connection_pools[address] = ConnectionPool(address)
+    return connection_pools[address]
+
+def route(command_str):
+    parts = command_str.split(" ", 2)
+    if cluster is None or len(parts) < 2 or parts[0].upper() not in READ_COMMANDS | WRITE_COMMANDS:
+        return server_address
+    return parse_node(cluster.placement(parts[1])[0])
+
+def send_command(command_str="", payload=b""):
+    # pada mode cluster balasan REDIRECT (ring client berbeda dengan server) diikuti sekali
+    address = route(command_str)
+    hasil = send_to(address, command_str, payload)
+    if hasil and hasil.get('status') == 'REDIRECT':
+        logging.warning(f"redirected to {hasil['data']}")
+        hasil = send_to(parse_node(hasil['data']), command_str, payload)
+    return hasil
+
+def send_to(address, command_str="", payload=b""):
+
+    def exchange(sock):
+        if binary_mode:
+            sock.sendall(pack_request(command_str, len(payload)))
+            if payload:
+                sock.sendall(payload)
+            return recv_binary(sock)
+        # server perlu terminator untuk tahu akhir request
+        sock.sendall((command_str + "\r\n\r\n").encode())
+        return recv_text(sock)
 
-def send_command(command_str=""):
-    global server_address
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect(server_address)
-    logging.warning(f"connecting to {server_address}")
     try:
-        sock.sendall(command_str.encode())
-        data_received = ""
-        while True:
-            data = sock.recv(1024)
-            if data:
-                data_received += data.decode()
-                if "\r\n\r\n" in data_received:
-                    break
-            else:
+        if keep_alive:
+            return get_pool(address).request(exchange)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.connect(address)
+        logging.warning(f"connecting to {address}")
+        try:
+            return exchange(sock)
+        finally:
+            sock.close()
+    except:
+        logging.warning("error during data receiving")
+        return False
+
+def recv_text(sock):
+    data_received = ""
+    while True:
+        data = sock.recv(1024)
+        if data:
+            data_received += data.decode()
+            if "\r\n\r\n" in data_received:
                 break
-        hasil = json.loads(data_received.strip())
+        else:
+            break
+    if not data_received:
+        raise ConnectionError("connection closed by server")
+    hasil = json.loads(data_received.strip())
+    return hasil
+
+def recv_binary(sock):
+    reader = SocketReader(sock)
+    hasil, payload_len = read_response(reader)
+    hasil['payload'] = reader.read_exact(payload_len)
+    return hasil
+
+def send_pipeline(commands):
+    # kirim semua perintah tanpa menunggu balasan; balasan dicocokkan lewat id
+    def exchange(sock):
+        def writer():
+            for request_id, command_str in enumerate(commands):
+                tagged = f"#{request_id} {command_str}"
+                if binary_mode:
+                    sock.sendall(pack_request(tagged))
+                else:
+                    sock.sendall((tagged + "\r\n\r\n").encode())
+
+        sender = threading.Thread(target=writer, daemon=True)
+        sender.start()
+        reader = SocketReader(sock)
+        hasil = [None] * len(commands)
+        for _ in commands:
+            if binary_mode:
+                response, payload_len = read_response(reader)
+                response['payload'] = reader.read_exact(payload_len)
+            else:
+                data = reader.read_until(b"\r\n\r\n")
+                if not data:
+                    raise ConnectionError("connection closed by server")
+                response = json.loads(data)
+            hasil[int(response['id'])] = response
+        sender.join()
         return hasil
+
+    try:
+        return get_pool().request(exchange)
     except:
-        logging.warning("error during data receiving")
+        logging.warning("error during pipelined request")
         return False
 
-def remote_list():
-    command_str = "LIST"
-    hasil = send_command(command_str)
-    if hasil['status'] == 'OK':
-        print("Daftar file:")
-        for nmfile in hasil['data']:
-            print(f"- {nmfile}")
-    else:
-        print("Gagal:", hasil['data'])
+def send_batch(commands):
+    return send_command("BATCH " + json.dumps(list(commands)))
+
+def close_connections():
+    for pool in connection_pools.values():
+        pool.close()
+    connection_pools.clear()
+
+def remote_list(pattern="*", page_size=0):
+    # page_size > 0: ambil daftar per halaman memakai cursor dari server
+    cursor = ""
+    print("Daftar file:")
+    while True:
+        command_str = f"LIST {pattern} {page_size} {cursor}".strip()
+        hasil = send_command(command_str)
+        if hasil['status'] != 'OK':
+            print("Gagal:", hasil['data'])
+            return
+        for nmfile in hasil.get('files', []):
+            print(f"- {nmfile['name']} ({nmfile['size']} bytes)")
+        cursor = hasil.get('next_cursor')
+        if not cursor:
+            break
 
 def remote_get(filename=""):
     command_str = f"GET {filename}"
+    if compression:
+        command_str += f" encoding={compression}"
     hasil = send_command(command_str)
     if hasil['status'] == 'OK':
         namafile = hasil['data_namafile']
-        isifile = base64.b64decode(hasil['data_file'])
+        if binary_mode:
+            isifile = hasil['payload']
+        else:
+            isifile = base64.b64decode(hasil['data_file'])
+        if hasil.get('encoding'):
+            isifile = decompress_bytes(isifile, hasil['encoding'])
+        # sha256 dari server: isi yang terpotong/rusak di jalan tidak ditulis ke disk
+        if hasil.get('sha256') and hashlib.sha256(isifile).hexdigest() != hasil['sha256']:
+            print(f"Gagal: checksum {namafile} tidak cocok")
+            return
         with open(namafile, 'wb') as f:
             f.write(isifile)
         print(f"File {namafile} berhasil diunduh.")
@@ -52,18 +176,134 @@ def remote_get(filename=""):
 def remote_upload(filename=""):
     try:
         with open(filename, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode()
-        command_str = f'UPLOAD {filename} {encoded}'
-        hasil = send_command(command_str)
+            isifile = f.read()
+        # server memverifikasi digest ini sebelum menyimpan file
+        command_str = f'UPLOAD {filename} sha256={hashlib.sha256(isifile).hexdigest()}'
+        # kompres hanya jika isinya layak dikompresi
+        if compression and looks_compressible(filename):
+            isifile = compress_bytes(isifile, compression)
+            command_str += f" encoding={compression}"
+        if binary_mode:
+            hasil = send_command(command_str, isifile)
+        else:
+            hasil = send_command(f'{command_str} {base64.b64encode(isifile).decode()}')
         print(hasil['data'])
     except Exception as e:
         print(f"Gagal upload: {e}")
 
+def file_digest(filename, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def remote_stat(filename=""):
+    hasil = send_command(f"STAT {filename}")
+    if hasil and hasil['status'] == 'OK':
+        print(f"{filename}: {hasil['size']} bytes, sha256 {hasil['sha256']}")
+    return hasil
+
+def remote_get_if_changed(filename=""):
+    # lewati unduhan jika file lokal sudah sama dengan yang ada di server (dicek lewat STAT, tanpa transfer isi)
+    hasil = send_command(f"STAT {filename}")
+    if hasil and hasil['status'] == 'OK' and os.path.exists(filename) \
+            and os.path.getsize(filename) == hasil['size'] and file_digest(filename) == hasil['sha256']:
+        print(f"File {filename} sudah sama, unduhan dilewati.")
+        return
+    remote_get(filename)
+
+def remote_upload_dedup(filename=""):
+    # jika server sudah menyimpan isi yang sama, cukup kirim LINK tanpa mengirim ulang isi file
+    hasil = send_command(f"LINK {filename} {file_digest(filename)}")
+    if hasil and hasil['status'] == 'OK':
+        print(hasil['data'], "(tanpa transfer isi)")
+        return
+    remote_upload(filename)
+
+def remote_get_resume(filename="", segment_size=8 * 1024 * 1024):
+    # lanjutkan unduhan dari ukuran file lokal; tiap segmen langsung ditulis sehingga gangguan hanya mengulang satu segmen
+    offset = os.path.getsize(filename) if os.path.exists(filename) else 0
+    with open(filename, 'ab') as f:
+        while True:
+            hasil = send_command(f"GET {filename} {offset} {segment_size}")
+            if not hasil or hasil['status'] != 'OK':
+                print("Gagal:", hasil['data'] if hasil else "koneksi terputus")
+                return False
+            isifile = hasil['payload'] if binary_mode else base64.b64decode(hasil['data_file'])
+            f.write(isifile)
+            f.flush()
+            offset += len(isifile)
+            if not isifile or offset >= hasil['size']:
+                break
+    print(f"File {filename} berhasil diunduh ({offset} bytes).")
+    return True
+
+def remote_upload_resume(filename="", segment_size=8 * 1024 * 1024):
+    # tanyakan ukuran file di server lalu kirim hanya bagian yang belum ada
+    total = os.path.getsize(filename)
+    hasil = send_command(f"SIZE {filename}")
+    offset = hasil['size'] if hasil and hasil['status'] == 'OK' else 0
+    if offset > total:
+        offset = 0
+    try:
+        with open(filename, "rb") as f:
+            f.seek(offset)
+            while True:
+                isi = f.read(segment_size)
+                if not isi and offset > 0:
+                    break
+                if offset == 0:
+                    command_str = f'UPLOAD {filename}'
+                else:
+                    command_str = f'UPLOADAT {filename} {offset}'
+                if binary_mode:
+                    hasil = send_command(command_str, isi)
+                else:
+                    hasil = send_command(f'{command_str} {base64.b64encode(isi).decode()}')
+                if not hasil or hasil['status'] != 'OK':
+                    print("Gagal upload:", hasil['data'] if hasil else "koneksi terputus")
+                    return False
+                offset += len(isi)
+                if offset >= total:
+                    break
+        print(f"File {filename} uploaded ({offset} bytes).")
+        return True
+    except Exception as e:
+        print(f"Gagal upload: {e}")
+        return False
+
+def remote_get_parallel(filename="", segment_size=SEGMENT_SIZE, concurrency=4):
+    try:
+        total = parallel_download(send_command, filename, filename, binary_mode, segment_size, concurrency)
+        print(f"File {filename} berhasil diunduh ({total} bytes, {concurrency} koneksi).")
+        return True
+    except Exception as e:
+        print(f"Gagal download: {e}")
+        return False
+
+def remote_upload_parallel(filename="", segment_size=SEGMENT_SIZE, concurrency=4):
+    try:
+        total = parallel_upload(send_command, filename, filename, binary_mode, segment_size, concurrency)
+        print(f"File {filename} uploaded ({total} bytes, {concurrency} koneksi).")
+        return True
+    except Exception as e:
+        print(f"Gagal upload: {e}")
+        return False
+
 def remote_delete(filename=""):
     command_str = f"DELETE {filename}"
     hasil = send_command(command_str)
     print(hasil['data'])
 
+def remote_delete_many(filenames=[]):
+    hasil = send_pipeline([f"DELETE {nmfile}" for nmfile in filenames])
+    if not hasil:
+        print("Gagal menghapus file")
+        return
+    for nmfile, h in zip(filenames, hasil):
+        print(f"- {nmfile}: {h['data']}")
+
 if __name__ == '__main__':
     # Contoh penggunaan:
     remote_list()
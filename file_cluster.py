@@ -0,0 +1,147 @@
+import hashlib
+import os
+import socket
+import threading
+from bisect import bisect, insort
+from file_connection_pool import ConnectionPool
+from file_framing import SocketReader, pack_request, read_response
+
+# perintah yang mengubah file harus dilayani node primer; perintah baca cukup oleh salah satu replika
+WRITE_COMMANDS = {"UPLOAD", "UPLOADAT", "ALLOCATE", "DELETE", "LINK"}
+READ_COMMANDS = {"GET", "SIZE", "STAT"}
+
+
+def ring_hash(key):
+    # hash stabil antar proses dan mesin (bukan hash() bawaan Python yang diacak per proses)
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def parse_node(node):
+    host, _, port = node.rpartition(":")
+    return host, int(port)
+
+
+def split_replica(parts):
+    # token terakhir "replica" menandai tulisan dari node primer ke replika (tidak direplikasi ulang)
+    if len(parts) > 1 and parts[-1].lower() == "replica":
+        return parts[:-1], True
+    return parts, False
+
+
+class HashRing:
+    # consistent hashing dengan virtual node: menambah node hanya memindahkan key yang jatuh ke titik milik node baru
+    def __init__(self, nodes=(), vnodes=64):
+        self.vnodes = vnodes
+        self.points = []
+        self.owners = {}
+        self.nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = ring_hash(f"{node}#{i}")
+            self.owners[point] = node
+            insort(self.points, point)
+
+    def remove(self, node):
+        self.nodes.remove(node)
+        self.points = [p for p in self.points if self.owners[p] != node]
+        self.owners = {p: self.owners[p] for p in self.points}
+
+    def lookup(self, key, count=1):
+        # count node berbeda searah jarum jam mulai dari posisi key; yang pertama adalah primer
+        if not self.points:
+            return []
+        count = min(count, len(self.nodes))
+        hasil = []
+        i = bisect(self.points, ring_hash(key))
+        while len(hasil) < count:
+            node = self.owners[self.points[i % len(self.points)]]
+            if node not in hasil:
+                hasil.append(node)
+            i += 1
+        return hasil
+
+
+class Cluster:
+    # ring bersama (sama di semua server dan client) + identitas node ini; node None untuk client
+    def __init__(self, nodes, node=None, replicas=1, vnodes=64, misroute="redirect"):
+        self.ring = HashRing(nodes, vnodes)
+        self.node = node
+        self.replicas = max(1, replicas)
+        self.misroute = misroute
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, port=None, node=None):
+        # cluster_nodes="127.0.0.1:7001,127.0.0.1:7002"; kosong = bukan mode cluster
+        nodes = [n.strip() for n in os.getenv("cluster_nodes", "").split(",") if n.strip()]
+        if not nodes:
+            return None
+        if node is None and port is not None:
+            matches = [n for n in nodes if parse_node(n)[1] == port]
+            node = matches[0] if len(matches) == 1 else None
+        if port is not None and node not in nodes:
+            raise ValueError(f"node ini ({node or port}) tidak ada di cluster_nodes, pakai --node host:port")
+        return cls(nodes, node, int(os.getenv("cluster_replicas", "1")), int(os.getenv("cluster_vnodes", "64")),
+                   os.getenv("cluster_misroute", "redirect"))
+
+    def placement(self, filename):
+        return self.ring.lookup(filename, self.replicas)
+
+    def route(self, command, filename, replica=False):
+        # None = dilayani di node ini, selain itu node yang seharusnya melayani
+        nodes = self.placement(filename)
+        if command in WRITE_COMMANDS:
+            if nodes[0] == self.node or (replica and self.node in nodes):
+                return None
+            return nodes[0]
+        if command in READ_COMMANDS and self.node not in nodes:
+            return nodes[0]
+        return None
+
+    def replicas_for(self, filename):
+        # replika yang harus menerima salinan tulisan; hanya node primer yang mereplikasi
+        nodes = self.placement(filename)
+        return nodes[1:] if nodes[0] == self.node else []
+
+    def pool(self, node):
+        with self.lock:
+            if node not in self.pools:
+                self.pools[node] = ConnectionPool(parse_node(node), max_idle=16, timeout=600)
+            return self.pools[node]
+
+    def connect(self, node):
+        sock = socket.create_connection(parse_node(node), timeout=600)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def send_file(self, node, command_str, filepath, offset=0, count=None):
+        # perintah biner dengan payload langsung dari file (sendfile), untuk replikasi dan rebalance
+        def exchange(sock):
+            with open(filepath, "rb") as f:
+                size = count if count is not None else os.fstat(f.fileno()).st_size - offset
+                sock.sendall(pack_request(command_str, size))
+                if size:
+                    sock.sendfile(f, offset, size)
+            return self._read_meta(sock)
+
+        return self.pool(node).request(exchange)
+
+    def command(self, node, command_str):
+        def exchange(sock):
+            sock.sendall(pack_request(command_str))
+            return self._read_meta(sock)
+
+        return self.pool(node).request(exchange)
+
+    def _read_meta(self, sock):
+        reader = SocketReader(sock)
+        meta, payload_len = read_response(reader)
+        reader.read_exact(payload_len)
+        return meta
@@ -0,0 +1,199 @@
+import math
+import os
+import tempfile
+import threading
+import zlib
+from collections import Counter
+from glob import escape, glob
+from urllib.parse import quote
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# codec: nama -> (pembuat compressor, pembuat decompressor); keduanya bergaya zlib.compressobj/decompressobj
+CODECS = {
+    "zlib": (lambda: zlib.compressobj(6), zlib.decompressobj),
+}
+if zstandard is not None:
+    CODECS["zstd"] = (lambda: zstandard.ZstdCompressor(level=3).compressobj(),
+                      lambda: zstandard.ZstdDecompressor().decompressobj())
+
+# ekstensi yang isinya hampir pasti sudah terkompresi
+SKIP_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz", ".bz2", ".xz", ".zst",
+                   ".7z", ".rar", ".mp3", ".mp4", ".mkv", ".avi", ".mov"}
+
+
+def register_codec(name, compressor, decompressor):
+    CODECS[name] = (compressor, decompressor)
+
+
+def split_encoding(parts):
+    # token terakhir "encoding=zlib,zstd" berisi codec yang diterima/dipakai client
+    if len(parts) > 1 and parts[-1].lower().startswith("encoding="):
+        return parts[:-1], [c for c in parts[-1][len("encoding="):].lower().split(",") if c]
+    return parts, []
+
+
+def choose_codec(accepted):
+    for codec in accepted:
+        if codec in CODECS:
+            return codec
+    return None
+
+
+def entropy(sample):
+    # entropi Shannon dalam bit per byte (0..8); data acak/terkompresi mendekati 8
+    if not sample:
+        return 0.0
+    n = len(sample)
+    return -sum(c / n * math.log2(c / n) for c in Counter(sample).values())
+
+
+def looks_compressible(filepath, sample_size=16 * 1024, threshold=7.5):
+    if os.path.splitext(filepath)[1].lower() in SKIP_EXTENSIONS:
+        return False
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        # ambil sampel di awal, tengah dan akhir file
+        sample = b""
+        for offset in sorted({0, max(0, size // 2 - sample_size // 2), max(0, size - sample_size)}):
+            f.seek(offset)
+            sample += f.read(sample_size)
+    return entropy(sample) < threshold
+
+
+def compress_bytes(data, codec):
+    compressor = CODECS[codec][0]()
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_bytes(data, codec):
+    decoder = Decompressor(codec)
+    return decoder.feed(data) + decoder.flush()
+
+
+class Decompressor:
+    # decoder bergaya feed/flush seperti Base64Decoder; sidecar (opsional) ikut menyimpan data terkompresi
+    def __init__(self, codec, sidecar=None):
+        if codec not in CODECS:
+            raise ValueError(f"encoding tidak didukung: {codec}")
+        self.obj = CODECS[codec][1]()
+        self.sidecar = sidecar
+
+    def feed(self, chunk):
+        if self.sidecar is not None:
+            self.sidecar.write(chunk)
+        return self.obj.decompress(chunk)
+
+    def flush(self):
+        return self.obj.flush()
+
+
+class DecoderChain:
+    def __init__(self, *decoders):
+        self.decoders = decoders
+
+    def feed(self, chunk):
+        for decoder in self.decoders:
+            chunk = decoder.feed(chunk)
+        return chunk
+
+    def flush(self):
+        data = b""
+        for decoder in self.decoders:
+            data = (decoder.feed(data) if data else b"") + decoder.flush()
+        return data
+
+
+class CompressedStore:
+    # salinan terkompresi file di <root>/.z/, nama memuat mtime dan ukuran file asli sehingga salinan
+    # basi tidak pernah dipakai; GET terkompresi berikutnya langsung memakai salinan ini
+    def __init__(self, storage, min_size=None):
+        if min_size is None:
+            min_size = int(os.getenv("compress_min_size", "1024"))
+        self.storage = storage
+        self.min_size = min_size
+        self.z_dir = os.path.join(storage.root, ".z")
+        self.decisions = {}
+        self.lock = threading.Lock()
+
+    def _prefix(self, filename):
+        # "@" selalu di-quote sehingga prefix satu nama tidak pernah cocok dengan nama lain
+        return os.path.join(self.z_dir, quote(filename, safe="")) + "@"
+
+    def _path(self, filename, st, codec):
+        return f"{self._prefix(filename)}{st.st_mtime_ns}-{st.st_size}.{codec}"
+
+    def negotiate(self, filename, accepted):
+        # codec yang dipakai untuk GET file ini, atau None jika dikirim apa adanya
+        codec = choose_codec(accepted)
+        if codec is None:
+            return None
+        filepath = self.storage.path(filename)
+        st = os.stat(filepath)
+        if st.st_size < self.min_size:
+            return None
+        key = (filepath, st.st_mtime_ns, st.st_size)
+        with self.lock:
+            decision = self.decisions.get(key)
+        if decision is None:
+            decision = looks_compressible(filepath)
+            with self.lock:
+                if len(self.decisions) > 4096:
+                    self.decisions.clear()
+                self.decisions[key] = decision
+        return codec if decision else None
+
+    def compressed_path(self, filename, codec, chunk_size=1024 * 1024):
+        # path salinan terkompresi; dibuat secara streaming jika belum ada
+        filepath = self.storage.path(filename)
+        st = os.stat(filepath)
+        path = self._path(filename, st, codec)
+        if os.path.exists(path):
+            return path
+        f, tmp = self.open_sidecar()
+        try:
+            compressor = CODECS[codec][0]()
+            with f, open(filepath, "rb") as src:
+                for chunk in iter(lambda: src.read(chunk_size), b""):
+                    f.write(compressor.compress(chunk))
+                f.write(compressor.flush())
+            os.replace(tmp, path)
+            self.discard(filename, keep=path)
+        except BaseException:
+            self._unlink(tmp)
+            raise
+        return path
+
+    def open_sidecar(self):
+        os.makedirs(self.z_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.z_dir, prefix="tmp-")
+        return os.fdopen(fd, "wb"), tmp
+
+    def install(self, filename, codec, f, tmp, st):
+        # simpan data terkompresi dari upload sebagai salinan untuk versi file st yang baru ditulis
+        f.close()
+        try:
+            path = self._path(filename, st, codec)
+            os.replace(tmp, path)
+            self.discard(filename, keep=path)
+        except OSError:
+            self._unlink(tmp)
+
+    def abandon(self, f, tmp):
+        # upload gagal: buang salinan terkompresi yang sedang ditulis
+        f.close()
+        self._unlink(tmp)
+
+    def discard(self, filename, keep=None):
+        for path in glob(escape(self._prefix(filename)) + "*"):
+            if path != keep:
+                self._unlink(path)
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
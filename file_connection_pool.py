@@ -0,0 +1,64 @@
+import socket
+import threading
+
+
+class ConnectionPool:
+    # pool koneksi persistent ke satu server, aman dipakai bersama oleh banyak thread
+    def __init__(self, address, max_idle=64, timeout=None):
+        self.address = address
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # socket tidak bisa di-pickle; proses lain membuat pool kosong sendiri
+        return {'address': self.address, 'max_idle': self.max_idle, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), True
+        return self._connect(), False
+
+    def release(self, sock):
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(sock)
+                return
+        sock.close()
+
+    def request(self, fn):
+        sock, reused = self.acquire()
+        try:
+            result = fn(sock)
+        except ConnectionError:
+            sock.close()
+            if not reused:
+                raise
+            # koneksi lama sudah ditutup server (idle timeout), ulangi sekali dengan koneksi baru
+            sock = self._connect()
+            try:
+                result = fn(sock)
+            except Exception:
+                sock.close()
+                raise
+        except Exception:
+            sock.close()
+            raise
+        self.release(sock)
+        return result
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for sock in idle:
+            sock.close()
@@ -0,0 +1,100 @@
+import os
+import stat
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+from fnmatch import fnmatchcase
+
+
+class DirectoryIndex:
+    # daftar file di satu direktori yang disimpan di memori: nama terurut + (size, mtime)
+    # diperbarui oleh UPLOAD/DELETE; perubahan dari luar server terdeteksi lewat mtime direktori
+    # atau rescan berkala setiap rescan_interval detik
+    def __init__(self, path='.', rescan_interval=None):
+        if rescan_interval is None:
+            rescan_interval = float(os.getenv("index_rescan", "60"))
+        self.path = path
+        self.rescan_interval = rescan_interval
+        self.names = []
+        self.entries = {}
+        self.scanned_at = None
+        self.dir_mtime = None
+        self.lock = threading.Lock()
+
+    def _dir_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def rescan(self):
+        dir_mtime = self._dir_mtime()
+        entries = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        entries[entry.name] = (st.st_size, st.st_mtime)
+                except OSError:
+                    pass
+        with self.lock:
+            self.entries = entries
+            self.names = sorted(entries)
+            self.scanned_at = time.monotonic()
+            self.dir_mtime = dir_mtime
+
+    def _is_stale(self):
+        if self.scanned_at is None:
+            return True
+        if self.rescan_interval and time.monotonic() - self.scanned_at > self.rescan_interval:
+            return True
+        return self._dir_mtime() != self.dir_mtime
+
+    def update(self, name):
+        # panggil setelah file ditulis/dihapus; hanya file langsung di direktori ini yang diindeks
+        if self.scanned_at is None or os.path.basename(name) != name:
+            return
+        try:
+            st = os.stat(os.path.join(self.path, name))
+            info = (st.st_size, st.st_mtime) if stat.S_ISREG(st.st_mode) else None
+        except OSError:
+            info = None
+        dir_mtime = self._dir_mtime()
+        with self.lock:
+            if info is None:
+                if self.entries.pop(name, None) is not None:
+                    del self.names[bisect_left(self.names, name)]
+            else:
+                if name not in self.entries:
+                    insort(self.names, name)
+                self.entries[name] = info
+            self.dir_mtime = dir_mtime
+
+    def page(self, pattern='', cursor='', limit=0):
+        # pattern berupa prefix atau glob (*, ?, [..]); cursor = nama terakhir halaman sebelumnya
+        if self._is_stale():
+            self.rescan()
+        prefix = pattern
+        for i, ch in enumerate(pattern):
+            if ch in '*?[':
+                prefix = pattern[:i]
+                break
+        is_glob = prefix != pattern
+        hasil = []
+        next_cursor = None
+        with self.lock:
+            start = bisect_left(self.names, prefix)
+            if cursor:
+                start = max(start, bisect_right(self.names, cursor))
+            for i in range(start, len(self.names)):
+                name = self.names[i]
+                if not name.startswith(prefix):
+                    break
+                if is_glob and not fnmatchcase(name, pattern):
+                    continue
+                if limit and len(hasil) == limit:
+                    next_cursor = hasil[-1][0]
+                    break
+                hasil.append((name,) + self.entries[name])
+        return hasil, next_cursor
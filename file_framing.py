@@ -0,0 +1,338 @@
+import base64
+import json
+import select
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Mode biner: setiap frame diawali MAGIC, lalu panjang header dan panjang payload.
+# Request : MAGIC | panjang perintah (u32) | panjang payload (u64) | perintah (utf-8) | payload mentah
+# Response: MAGIC | panjang meta (u32)     | panjang payload (u64) | meta (JSON)      | payload mentah
+MAGIC = b"FBIN"
+FRAME_HEADER = struct.Struct("!4sIQ")
+TERMINATOR = b"\r\n\r\n"
+MAX_HEADER_SIZE = 64 * 1024
+# token opsional pada header upload teks, di antara nama file (dan offset) dan payload base64
+UPLOAD_OPTIONS = (b"encoding=", b"sha256=")
+
+# encoder JSON untuk response: nama -> fungsi obj -> bytes; default yang tercepat yang terpasang
+JSON_ENCODERS = {
+    "json": lambda obj: json.dumps(obj).encode(),
+}
+if ujson is not None:
+    JSON_ENCODERS["ujson"] = lambda obj: ujson.dumps(obj, escape_forward_slashes=False).encode()
+if orjson is not None:
+    JSON_ENCODERS["orjson"] = orjson.dumps
+_json_encoder = JSON_ENCODERS.get("orjson") or JSON_ENCODERS.get("ujson") or JSON_ENCODERS["json"]
+
+
+class ReadBuffer:
+    # logika buffer tanpa I/O yang dipakai bersama SocketReader (blocking) dan AsyncSocketReader (asyncio).
+    # tiap take_* mengambil satu unit dari buffer, atau None jika datanya belum lengkap; eof=True berarti
+    # data tidak akan bertambah lagi sehingga take_* harus memberi hasil (atau error)
+    def __init__(self, initial=b""):
+        self.buffer = bytearray(initial)
+        # posisi awal pencarian delimiter berikutnya pada take_until, supaya baris panjang tidak dipindai ulang
+        self.scan = 0
+
+    def take_exact(self, n, eof=False):
+        if len(self.buffer) < n:
+            if eof:
+                raise ConnectionError(f"connection closed after {len(self.buffer)} of {n} bytes")
+            return None
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def take_available(self, n):
+        data = bytes(self.buffer[:n])
+        del self.buffer[:len(data)]
+        return data
+
+    def take_peek(self, n, eof=False):
+        if len(self.buffer) < n and not eof:
+            return None
+        return bytes(self.buffer[:n])
+
+    def take_token(self, separator=b" ", eof=False):
+        # token dibatasi spasi; berhenti juga di TERMINATOR tanpa mengonsumsinya
+        idx = self.buffer.find(separator)
+        end = self.buffer.find(TERMINATOR)
+        if end >= 0 and (idx < 0 or end < idx):
+            token = bytes(self.buffer[:end])
+            del self.buffer[:end]
+            return token
+        if idx >= 0:
+            token = bytes(self.buffer[:idx])
+            del self.buffer[:idx + len(separator)]
+            return token
+        if len(self.buffer) > MAX_HEADER_SIZE:
+            raise ValueError("request header too large")
+        if eof:
+            token = bytes(self.buffer)
+            self.buffer.clear()
+            return token
+        return None
+
+    def take_until(self, delimiter=TERMINATOR, eof=False):
+        idx = self.buffer.find(delimiter, self.scan)
+        if idx >= 0 or eof:
+            if idx < 0:
+                idx = len(self.buffer)
+            data = bytes(self.buffer[:idx])
+            del self.buffer[:idx + len(delimiter)]
+            self.scan = 0
+            return data
+        self.scan = max(0, len(self.buffer) - len(delimiter) + 1)
+        return None
+
+    def take_chunk_until(self, delimiter=TERMINATOR, eof=False):
+        # potongan data sebelum delimiter untuk dialirkan: (chunk, selesai); ekor yang mungkin awal
+        # delimiter ditahan sampai data berikutnya datang
+        idx = self.buffer.find(delimiter)
+        if idx >= 0 or eof:
+            if idx < 0:
+                idx = len(self.buffer)
+            chunk = bytes(self.buffer[:idx])
+            del self.buffer[:idx + len(delimiter)]
+            return chunk, True
+        keep = len(delimiter) - 1
+        if len(self.buffer) > keep:
+            chunk = bytes(self.buffer[:len(self.buffer) - keep])
+            del self.buffer[:len(chunk)]
+            return chunk, False
+        return None
+
+    def take_frame(self, eof=False):
+        # header frame biner: (header, panjang payload); payload dibaca terpisah oleh pemanggil
+        if len(self.buffer) >= FRAME_HEADER.size:
+            magic, header_len, payload_len = FRAME_HEADER.unpack_from(self.buffer)
+            if magic != MAGIC:
+                raise ValueError("invalid frame magic")
+            if header_len > MAX_HEADER_SIZE:
+                raise ValueError(f"frame header too large ({header_len} bytes)")
+            end = FRAME_HEADER.size + header_len
+            if len(self.buffer) >= end:
+                header = bytes(self.buffer[FRAME_HEADER.size:end])
+                del self.buffer[:end]
+                return header, payload_len
+        if eof:
+            raise ConnectionError(f"connection closed after {len(self.buffer)} bytes of frame header")
+        return None
+
+    def take_upload_header(self, eof=False):
+        # header upload teks sebelum payload base64: "UPLOAD nama [offset] [encoding=..] [sha256=..] ".
+        # diambil utuh sekaligus, token opsional yang baru sebagian diterima ditunggu sampai lengkap
+        tokens, pos = [], 0
+        longest = max(len(option) for option in UPLOAD_OPTIONS)
+        while True:
+            required = 3 if tokens and tokens[0].upper() == b"UPLOADAT" else 2
+            if len(tokens) >= required:
+                head = bytes(self.buffer[pos:pos + longest]).lower()
+                if not head.startswith(UPLOAD_OPTIONS):
+                    if not eof and any(option.startswith(head) for option in UPLOAD_OPTIONS):
+                        return None
+                    break
+            idx = self.buffer.find(b" ", pos)
+            end = self.buffer.find(TERMINATOR, pos)
+            if end >= 0 and (idx < 0 or end < idx):
+                tokens.append(bytes(self.buffer[pos:end]))
+                pos = end
+            elif idx >= 0:
+                tokens.append(bytes(self.buffer[pos:idx]))
+                pos = idx + 1
+            elif len(self.buffer) > MAX_HEADER_SIZE:
+                raise ValueError("request header too large")
+            elif eof:
+                tokens.append(bytes(self.buffer[pos:]))
+                pos = len(self.buffer)
+            else:
+                return None
+        del self.buffer[:pos]
+        return [token.decode(errors="ignore").strip() for token in tokens if token.strip()]
+
+
+class SocketReader(ReadBuffer):
+    def __init__(self, sock, initial=b"", bufsize=1024 * 1024, max_bytes=None):
+        ReadBuffer.__init__(self, initial)
+        self.sock = sock
+        self.bufsize = bufsize
+        # batas total byte yang boleh diterima dari koneksi ini (None = tanpa batas)
+        self.max_bytes = max_bytes
+        self.received = len(self.buffer)
+
+    def _count(self, n):
+        self.received += n
+        if self.max_bytes and self.received > self.max_bytes:
+            raise ValueError(f"connection byte budget exceeded ({self.max_bytes} bytes)")
+
+    def _fill(self):
+        data = self.sock.recv(self.bufsize)
+        if not data:
+            return False
+        self._count(len(data))
+        self.buffer += data
+        return True
+
+    def _read(self, take, *args):
+        while True:
+            value = take(*args)
+            if value is not None:
+                return value
+            if not self._fill():
+                return take(*args, eof=True)
+
+    def read_exact(self, n):
+        if n - len(self.buffer) > self.bufsize:
+            return self._read_large(n)
+        return self._read(self.take_exact, n)
+
+    def _read_large(self, n):
+        # payload besar: recv_into langsung ke buffer seukuran payload tanpa menyalin ulang
+        if self.max_bytes and self.received + n - len(self.buffer) > self.max_bytes:
+            raise ValueError(f"connection byte budget exceeded ({self.max_bytes} bytes)")
+        data = bytearray(n)
+        view = memoryview(data)
+        got = len(self.buffer)
+        view[:got] = self.buffer
+        self.buffer.clear()
+        while got < n:
+            received = self.sock.recv_into(view[got:], min(self.bufsize, n - got))
+            if not received:
+                raise ConnectionError(f"connection closed after {got} of {n} bytes")
+            self._count(received)
+            got += received
+        return data
+
+    def peek(self, n):
+        return self._read(self.take_peek, n)
+
+    def read_token(self, separator=b" "):
+        return self._read(self.take_token, separator)
+
+    def read_frame(self):
+        return self._read(self.take_frame)
+
+    def read_upload_header(self):
+        return self._read(self.take_upload_header)
+
+    def read_until(self, delimiter=TERMINATOR, idle=None):
+        # idle (detik): jika delimiter belum datang dan koneksi diam selama itu, isi buffer dianggap satu
+        # pesan utuh (client lama yang mengirim perintah tanpa terminator lalu menunggu balasan). hanya
+        # untuk pesan sepanjang header; upload besar yang tersendat tetap menunggu delimiter
+        if idle is None:
+            return self._read(self.take_until, delimiter)
+        while True:
+            value = self.take_until(delimiter)
+            if value is not None:
+                return value
+            if len(self.buffer) <= MAX_HEADER_SIZE and not select.select([self.sock], [], [], idle)[0]:
+                return self.take_until(delimiter, eof=True)
+            if not self._fill():
+                return self.take_until(delimiter, eof=True)
+
+    def iter_exact(self, n):
+        remaining = n
+        if self.buffer:
+            chunk = self.take_available(remaining)
+            remaining -= len(chunk)
+            yield chunk
+        while remaining > 0:
+            data = self.sock.recv(min(self.bufsize, remaining))
+            if not data:
+                raise ConnectionError(f"connection closed after {n - remaining} of {n} bytes")
+            self._count(len(data))
+            remaining -= len(data)
+            yield data
+
+    def iter_until(self, delimiter=TERMINATOR):
+        done = False
+        while not done:
+            chunk, done = self._read(self.take_chunk_until, delimiter)
+            if chunk:
+                yield chunk
+
+
+class Base64Decoder:
+    def __init__(self):
+        self.pending = b""
+
+    def feed(self, chunk):
+        data = self.pending + chunk.translate(None, b" \t\r\n")
+        aligned = len(data) - len(data) % 4
+        self.pending = data[aligned:]
+        return base64.b64decode(data[:aligned])
+
+    def flush(self):
+        data, self.pending = self.pending, b""
+        return base64.b64decode(data) if data else b""
+
+
+def register_json_encoder(name, dumps):
+    JSON_ENCODERS[name] = dumps
+
+
+def use_json_encoder(name):
+    global _json_encoder
+    _json_encoder = JSON_ENCODERS[name]
+
+
+def json_bytes(obj):
+    return _json_encoder(obj)
+
+
+def text_response(meta):
+    return json_bytes(meta) + TERMINATOR
+
+
+def text_stream_prefix(meta, field="data_file"):
+    # awal response teks yang field terakhirnya (string) dikirim bertahap setelahnya, ditutup dengan TEXT_STREAM_END
+    head = json_bytes(meta)
+    return head[:-1] + b', "' + field.encode() + b'": "'
+
+
+TEXT_STREAM_END = b'"}' + TERMINATOR
+
+
+def send_buffers(sock, buffers):
+    # kirim beberapa buffer dengan satu sendmsg (scatter/gather) tanpa menggabungkannya menjadi satu bytes besar
+    views = [memoryview(b).cast("B") for b in buffers if b]
+    if not hasattr(sock, "sendmsg"):
+        for view in views:
+            sock.sendall(view)
+        return
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+
+def pack_request(command_str, payload_len=0):
+    header = command_str.encode()
+    return FRAME_HEADER.pack(MAGIC, len(header), payload_len) + header
+
+
+def pack_response(meta, payload_len=0):
+    header = json_bytes(meta)
+    return FRAME_HEADER.pack(MAGIC, len(header), payload_len) + header
+
+
+def read_request(reader):
+    header, payload_len = reader.read_frame()
+    return header.decode(), payload_len
+
+
+def read_response(reader):
+    header, payload_len = reader.read_frame()
+    return json.loads(header), payload_len
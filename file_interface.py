@@ -1,17 +1,29 @@
 import os
 import json
 import base64
-from glob import glob
+from file_cache import ContentCache
+from file_dirindex import DirectoryIndex
+from file_storage import make_storage
+from file_compression import decompress_bytes
 
 class FileInterface:
-    def __init__(self):
+    def __init__(self, cache=None):
         os.makedirs("files", exist_ok=True)
         os.chdir("files/")
+        self.cache = cache if cache is not None else ContentCache()
+        self.index = DirectoryIndex('.')
+        self.storage = make_storage('.')
 
     def list(self, params=[]):
+        # LIST [pola] [limit] [cursor]; pola berupa prefix atau glob, "*" = semua file
         try:
-            filelist = glob('*.*')
-            return dict(status='OK', data=filelist)
+            pattern = params[0] if len(params) > 0 and params[0] != '*' else ''
+            limit = int(params[1]) if len(params) > 1 else 0
+            cursor = params[2] if len(params) > 2 else ''
+            files, next_cursor = self.index.page(pattern, cursor, limit)
+            return dict(status='OK', data=[name for name, size, mtime in files],
+                        files=[dict(name=name, size=size, mtime=mtime) for name, size, mtime in files],
+                        next_cursor=next_cursor)
         except Exception as e:
             return dict(status='ERROR', data=str(e))
 
@@ -20,31 +32,178 @@ class FileInterface:
             filename = params[0]
             if (filename == ''):
                 return None
+            if len(params) > 1:
+                return self._get_range(filename, params[1:])
+            key = self.cache.key_for(filename, 'base64-str')
+            if self.cache.fits(key[2] * 4 // 3):
+                isifile = self.cache.get_or_load(key, lambda: self._read_base64(filename))
+            else:
+                isifile = self._read_base64(filename)
+            return self._with_checksum(dict(status='OK', data_namafile=filename, data_file=isifile))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def _get_range(self, filename, params):
+        isi, offset, size = self._read_range(filename, params)
+        isifile = base64.b64encode(isi).decode()
+        return dict(status='OK', data_namafile=filename, data_file=isifile, offset=offset, size=size)
+
+    def _read_range(self, filename, params):
+        size = os.path.getsize(filename)
+        offset = int(params[0])
+        length = int(params[1]) if len(params) > 1 else size - offset
+        if offset < 0 or length < 0 or offset > size:
+            raise ValueError(f"range tidak valid {offset}+{length} untuk ukuran {size}")
+        with open(filename, 'rb') as fp:
+            fp.seek(offset)
+            return fp.read(length), offset, size
+
+    def get_raw(self, params=[]):
+        # mode biner: isi file dikembalikan terpisah dari meta, tanpa base64
+        try:
+            filename = params[0]
+            if len(params) > 1:
+                isifile, offset, size = self._read_range(filename, params[1:])
+                return dict(status='OK', data_namafile=filename, offset=offset, size=size), isifile
             with open(filename, 'rb') as fp:
-                isifile = base64.b64encode(fp.read()).decode()
-            return dict(status='OK', data_namafile=filename, data_file=isifile)
+                isifile = fp.read()
+            return self._with_checksum(dict(status='OK', data_namafile=filename)), isifile
+        except Exception as e:
+            return dict(status='ERROR', data=str(e)), b''
+
+    def _with_checksum(self, hasil):
+        # sha256 yang tersimpan saat upload dikirim apa adanya, tanpa menghitung ulang
+        digest = self.storage.checksum(hasil['data_namafile'])
+        if digest is not None:
+            hasil['sha256'] = digest
+        return hasil
+
+    def _read_base64(self, filename):
+        with open(filename, 'rb') as fp:
+            return base64.b64encode(fp.read()).decode()
+
+    def upload(self, params=[], expected=None, encoding=()):
+        try:
+            file_content = base64.b64decode(params[1].encode())
         except Exception as e:
             return dict(status='ERROR', data=str(e))
+        return self.upload_raw(params[:1], file_content, expected, encoding)
 
-    def upload(self, params=[]):
+    def upload_raw(self, params=[], file_content=b'', expected=None, encoding=()):
         try:
             filename = params[0]
-            encoded_content = params[1]
-            file_content = base64.b64decode(encoded_content.encode())
-            with open(filename, 'wb') as f:
-                f.write(file_content)
-            return dict(status='OK', data=f"File {filename} uploaded successfully")
+            file_content = self._decompress(file_content, encoding)
+            upload = self._write(filename, file_content, expected=expected)
+            self.cache.invalidate(filename)
+            self.index.update(filename)
+            return dict(status='OK', data=f"File {filename} uploaded successfully", sha256=upload.digest)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def uploadat(self, params=[], expected=None, encoding=()):
+        # tulis mulai offset tanpa memotong file (offset "end" = tambahkan di akhir) untuk melanjutkan upload
+        try:
+            file_content = base64.b64decode(params[2].encode())
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+        return self.uploadat_raw(params[:2], file_content, expected, encoding)
+
+    def uploadat_raw(self, params=[], file_content=b'', expected=None, encoding=()):
+        try:
+            filename = params[0]
+            file_content = self._decompress(file_content, encoding)
+            offset = params[1].lower()
+            upload = self._write(filename, file_content, offset if offset == 'end' else int(offset), expected)
+            self.cache.invalidate(filename)
+            self.index.update(filename)
+            return dict(status='OK', data=f"File {filename} uploaded successfully", size=upload.size, sha256=upload.digest)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def _decompress(self, file_content, encoding):
+        # upload terkompresi (token encoding=) disimpan dalam bentuk aslinya; sha256 dihitung atas isi asli
+        if not encoding:
+            return file_content
+        if len(encoding) != 1:
+            raise ValueError("UPLOAD membutuhkan tepat satu encoding")
+        return decompress_bytes(file_content, encoding[0])
+
+    def _write(self, filename, file_content, offset=None, expected=None):
+        upload = self.storage.open_upload(filename, offset)
+        try:
+            upload.write(file_content)
+            if expected is not None and upload.hash.hexdigest() != expected:
+                raise ValueError("checksum sha256 tidak cocok, data rusak atau terpotong")
+        except Exception:
+            upload.abort()
+            raise
+        upload.commit()
+        return upload
+
+    def size(self, params=[]):
+        try:
+            filename = params[0]
+            return dict(status='OK', data_namafile=filename, size=os.path.getsize(filename))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def stat(self, params=[]):
+        # ukuran, mtime dan sha256 tanpa mengirim isi file; digest dihitung sekali jika belum tersimpan
+        try:
+            filename = params[0]
+            st = os.stat(filename)
+            digest = self.storage.checksum(filename, st) or self.storage.compute_checksum(filename)
+            return dict(status='OK', data_namafile=filename, size=st.st_size, mtime=st.st_mtime, sha256=digest)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def allocate(self, params=[]):
+        try:
+            filename = params[0]
+            size = int(params[1])
+            self.storage.allocate(filename, size)
+            self.cache.invalidate(filename)
+            self.index.update(filename)
+            return dict(status='OK', data=f"File {filename} allocated", size=size)
         except Exception as e:
             return dict(status='ERROR', data=str(e))
 
     def delete(self, params=[]):
         try:
             filename = params[0]
-            os.remove(filename)
+            self.storage.delete(filename)
+            self.cache.invalidate(filename)
+            self.index.update(filename)
             return dict(status='OK', data=f"File {filename} deleted successfully")
         except Exception as e:
             return dict(status='ERROR', data=str(e))
 
+    def have(self, params=[]):
+        # cek apakah isi dengan digest sha256 ini sudah tersimpan, supaya client bisa melewati upload
+        try:
+            digest = params[0].lower()
+            if not self.storage.have(digest):
+                return dict(status='ERROR', data=f"{digest} tidak ditemukan")
+            return dict(status='OK', data=digest)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def link(self, params=[]):
+        # LINK nama_file digest: buat file dari isi yang sudah tersimpan tanpa mengirim ulang
+        try:
+            filename = params[0]
+            size = self.storage.link(filename, params[1].lower())
+            self.cache.invalidate(filename)
+            self.index.update(filename)
+            return dict(status='OK', data=f"File {filename} uploaded successfully", size=size)
+        except FileNotFoundError:
+            return dict(status='ERROR', data=f"{params[1]} tidak ditemukan")
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def cachestats(self, params=[]):
+        return dict(status='OK', data=self.cache.stats())
+
 
 if __name__=='__main__':
     f = FileInterface()
@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import base64
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from file_framing import FRAME_HEADER, MAGIC, TERMINATOR, pack_request
+
+load_dotenv()
+
+SERVER_IP = os.getenv("ip_server", "127.0.0.1")
+SERVER_PORT = int(os.getenv("port_server", "6666"))
+UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 * 1024, 'mb': 1024 * 1024}
+
+
+class LatencyHistogram:
+    # histogram gaya HDR dalam mikrodetik: nilai < 128 disimpan persis, di atasnya tiap pangkat dua dibagi
+    # 64 bucket linear (presisi ~1.6%); bisa digabung antar proses karena hanya berisi hitungan per bucket
+    SUB_BUCKETS = 64
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - 7)
+        return shift * self.SUB_BUCKETS + (value >> shift)
+
+    def _value(self, index: int) -> int:
+        if index < 2 * self.SUB_BUCKETS:
+            return index
+        shift = index // self.SUB_BUCKETS - 1
+        return ((index - shift * self.SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        # detik; batas atas bucket yang memuat persentil ke-q
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    number = text.rstrip('kmb')
+    return int(float(number) * UNITS[text[len(number):]])
+
+
+def parse_profile(text: str) -> List[Tuple[str, float]]:
+    # "get:70,upload:20,list:10" -> bobot tiap operasi
+    profile = []
+    for item in text.split(','):
+        op, _, weight = item.partition(':')
+        op = op.strip().lower()
+        if op not in ('get', 'upload', 'list'):
+            raise ValueError(f"unknown operation {op}")
+        profile.append((op, float(weight or 1)))
+    return profile
+
+
+class LoadGenerator:
+    # open-loop: request dikirim sesuai jadwal tanpa menunggu request sebelumnya selesai; latensi dihitung dari
+    # waktu yang dijadwalkan sehingga antrean di server (atau di client) ikut terukur
+    def __init__(self, config: Dict, rate: float, seed: int = 0):
+        self.config = config
+        self.rate = rate
+        self.address = (config['host'], config['port'])
+        self.binary = config['protocol'] == 'binary'
+        self.random = random.Random(seed)
+        self.ops = [op for op, _ in config['profile']]
+        self.weights = [w for _, w in config['profile']]
+        self.sizes = config['sizes']
+        # isi file dibuat sekali dan dipakai ulang untuk semua UPLOAD, base64 sudah disiapkan untuk mode teks
+        self.payloads = {size: os.urandom(size) for size in self.sizes}
+        self.encoded = {size: base64.b64encode(data) for size, data in self.payloads.items()} if not self.binary else {}
+        self.idle = []
+        self.slots = None
+        self.histogram = LatencyHistogram()
+        self.by_op = {op: LatencyHistogram() for op in self.ops}
+        self.timeline = {}
+        self.errors = 0
+        self.sent = 0
+        self.max_lag = 0.0
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(*self.address, limit=64 * 1024 * 1024)
+        return reader, writer
+
+    async def _exchange(self, conn, command: str, payload: bytes = b'', encoded: bytes = b'') -> Dict:
+        reader, writer = conn
+        if self.binary:
+            writer.write(pack_request(command, len(payload)))
+            if payload:
+                writer.write(payload)
+            await writer.drain()
+            magic, header_len, payload_len = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("invalid frame magic")
+            result = json.loads(await reader.readexactly(header_len))
+            if payload_len:
+                await reader.readexactly(payload_len)
+            return result
+        writer.write(command.encode() + (b' ' + encoded if encoded else b'') + TERMINATOR)
+        await writer.drain()
+        return json.loads((await reader.readuntil(TERMINATOR))[:-len(TERMINATOR)])
+
+    def _command(self, op: str, size: int, seq: int) -> Tuple[str, bytes, bytes]:
+        label = f"{size}"
+        if op == 'get':
+            return f"GET lg_{label}.bin", b'', b''
+        if op == 'upload':
+            return f"UPLOAD lg_up_{seq % 32}_{label}.bin", self.payloads[size] if self.binary else b'', self.encoded.get(size, b'')
+        return "LIST", b'', b''
+
+    async def request(self, op: str, size: int, seq: int, scheduled: float, start: float) -> None:
+        command, payload, encoded = self._command(op, size, seq)
+        ok = False
+        async with self.slots:
+            conn = self.idle.pop() if self.idle else None
+            try:
+                if conn is None:
+                    conn = await self._connect()
+                result = await self._exchange(conn, command, payload, encoded)
+                ok = result.get('status') == 'OK'
+                self.idle.append(conn)
+            except Exception:
+                if conn is not None:
+                    conn[1].close()
+        done = time.perf_counter()
+        second = int(done - start)
+        bucket = self.timeline.setdefault(second, {'completed': 0, 'errors': 0, 'histogram': LatencyHistogram()})
+        if ok:
+            latency = done - scheduled
+            self.histogram.record(latency)
+            self.by_op[op].record(latency)
+            bucket['completed'] += 1
+            bucket['histogram'].record(latency)
+        else:
+            self.errors += 1
+            bucket['errors'] += 1
+
+    async def seed(self) -> None:
+        # file yang dibaca GET diunggah dulu, sekali per ukuran
+        conn = await self._connect()
+        try:
+            for size in self.sizes:
+                result = await self._exchange(conn, f"UPLOAD lg_{size}.bin", self.payloads[size],
+                                              base64.b64encode(self.payloads[size]) if not self.binary else b'')
+                if result.get('status') != 'OK':
+                    raise RuntimeError(f"seed upload failed: {result.get('data')}")
+        finally:
+            conn[1].close()
+
+    async def run(self) -> None:
+        self.slots = asyncio.Semaphore(self.config['connections'])
+        tasks = set()
+        start = time.perf_counter()
+        scheduled = start
+        deadline = start + self.config['duration']
+        while True:
+            if self.config['poisson']:
+                scheduled += self.random.expovariate(self.rate)
+            else:
+                scheduled += 1 / self.rate
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # jeda antara jadwal dan pengiriman sebenarnya; jika besar, client-lah yang menjadi bottleneck
+            self.max_lag = max(self.max_lag, time.perf_counter() - scheduled)
+            op = self.random.choices(self.ops, self.weights)[0]
+            size = self.random.choice(self.sizes)
+            task = asyncio.create_task(self.request(op, size, self.sent, scheduled, start))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            self.sent += 1
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.config['drain_timeout'])
+        for _, writer in self.idle:
+            writer.close()
+
+    def result(self) -> Dict:
+        return {'histogram': self.histogram, 'by_op': self.by_op, 'timeline': self.timeline,
+                'errors': self.errors, 'sent': self.sent, 'max_lag': self.max_lag}
+
+
+def run_process(args) -> Dict:
+    config, rate, seed = args
+    generator = LoadGenerator(config, rate, seed)
+    asyncio.run(generator.run())
+    return generator.result()
+
+
+def merge_results(results: List[Dict]) -> Dict:
+    merged = {'histogram': LatencyHistogram(), 'by_op': {}, 'timeline': {}, 'errors': 0, 'sent': 0, 'max_lag': 0.0}
+    for result in results:
+        merged['histogram'].merge(result['histogram'])
+        for op, histogram in result['by_op'].items():
+            merged['by_op'].setdefault(op, LatencyHistogram()).merge(histogram)
+        for second, bucket in result['timeline'].items():
+            target = merged['timeline'].setdefault(second, {'completed': 0, 'errors': 0, 'histogram': LatencyHistogram()})
+            target['completed'] += bucket['completed']
+            target['errors'] += bucket['errors']
+            target['histogram'].merge(bucket['histogram'])
+        merged['errors'] += result['errors']
+        merged['sent'] += result['sent']
+        merged['max_lag'] = max(merged['max_lag'], result['max_lag'])
+    return merged
+
+
+def summarize(merged: Dict, config: Dict) -> Dict:
+    histogram = merged['histogram']
+    percentiles = {f"p{q:g}".replace('.', ''): histogram.percentile(q) for q in (50, 90, 99, 99.9)}
+    return {
+        'target_rate': config['rate'],
+        'duration': config['duration'],
+        'sent': merged['sent'],
+        'completed': histogram.total,
+        'errors': merged['errors'],
+        'achieved_rate': histogram.total / config['duration'],
+        'max_schedule_lag': merged['max_lag'],
+        'latency': dict(percentiles, max=histogram.max / 1_000_000),
+        'by_operation': {op: {'count': h.total, 'p50': h.percentile(50), 'p99': h.percentile(99)}
+                         for op, h in merged['by_op'].items()},
+        'timeline': [{'second': second, 'completed': bucket['completed'], 'errors': bucket['errors'],
+                      'p50': bucket['histogram'].percentile(50), 'p99': bucket['histogram'].percentile(99)}
+                     for second, bucket in sorted(merged['timeline'].items())],
+    }
+
+
+def print_summary(summary: Dict) -> None:
+    print("\n=== Load Test Results ===")
+    print(f"target rate         : {summary['target_rate']:.1f} req/s")
+    print(f"achieved rate       : {summary['achieved_rate']:.1f} req/s")
+    print(f"sent/completed/err  : {summary['sent']}/{summary['completed']}/{summary['errors']}")
+    print(f"max schedule lag    : {summary['max_schedule_lag'] * 1000:.2f} ms")
+    print("latency (ms)        : " + "  ".join(f"{k}={v * 1000:.2f}" for k, v in summary['latency'].items()))
+    for op, stats in summary['by_operation'].items():
+        print(f"  {op:8} count={stats['count']:<7} p50={stats['p50'] * 1000:.2f}ms p99={stats['p99'] * 1000:.2f}ms")
+    print("\nsecond  completed  errors  p50(ms)  p99(ms)")
+    for row in summary['timeline']:
+        print(f"{row['second']:>6}  {row['completed']:>9}  {row['errors']:>6}  {row['p50'] * 1000:>7.2f}  {row['p99'] * 1000:>7.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load generator open-loop untuk file_stress_server")
+    parser.add_argument("--host", default=SERVER_IP)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--rate", type=float, default=100, help="target request per detik (total semua proses)")
+    parser.add_argument("--duration", type=float, default=10, help="lama pengujian (detik)")
+    parser.add_argument("--profile", default="get:70,upload:20,list:10", help="bobot operasi, contoh get:70,upload:20,list:10")
+    parser.add_argument("--sizes", default="4k,64k,1m", help="ukuran file GET/UPLOAD, dipilih acak")
+    parser.add_argument("--protocol", choices=["text", "binary"], default="binary")
+    parser.add_argument("--connections", type=int, default=256, help="batas koneksi bersamaan per proses")
+    parser.add_argument("--processes", type=int, default=1, help="jumlah proses driver")
+    parser.add_argument("--poisson", action="store_true", help="jarak antar request acak (Poisson), bukan tetap")
+    parser.add_argument("--drain-timeout", type=float, default=30, help="waktu tunggu request yang belum selesai")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="simpan hasil dalam format JSON")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    config = {
+        'host': args.host, 'port': args.port, 'rate': args.rate, 'duration': args.duration,
+        'profile': parse_profile(args.profile), 'sizes': [parse_size(s) for s in args.sizes.split(',') if s],
+        'protocol': args.protocol, 'connections': args.connections, 'poisson': args.poisson,
+        'drain_timeout': args.drain_timeout,
+    }
+    asyncio.run(LoadGenerator(config, args.rate, args.seed).seed())
+    print(f"Running {args.rate:.0f} req/s for {args.duration:.0f}s with {args.processes} process(es)...")
+    jobs = [(config, args.rate / args.processes, args.seed + i) for i in range(args.processes)]
+    if args.processes > 1:
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(run_process, jobs)
+    else:
+        results = [run_process(jobs[0])]
+    summary = summarize(merge_results(results), config)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMMANDS = ["GET", "UPLOAD", "UPLOADAT", "SIZE", "STAT", "ALLOCATE", "HAVE", "LINK", "LIST", "DELETE",
+            "BATCH", "CACHESTATS", "STATS", "CLOSE", "OTHER"]
+# batas atas bucket histogram latensi (detik); bucket terakhir (+Inf) menampung sisanya
+BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+# recv/send: menunggu socket selama request, decode: base64/kompresi (dua arah), disk: baca/tulis file
+PHASES = ["recv", "decode", "disk", "send"]
+COUNTERS = ["bytes_in", "bytes_out", "connections_total", "connections_active", "queued"] + \
+           [f"{phase}_seconds" for phase in PHASES]
+GAUGES = {"connections_active", "queued"}
+
+# isi satu slot: per perintah [count, jumlah detik, bucket...], lalu COUNTERS
+COMMAND_SIZE = 2 + len(BUCKETS) + 1
+COMMAND_INDEX = {command: i * COMMAND_SIZE for i, command in enumerate(COMMANDS)}
+COUNTER_INDEX = {name: len(COMMANDS) * COMMAND_SIZE + i for i, name in enumerate(COUNTERS)}
+SLOT_SIZE = len(COMMANDS) * COMMAND_SIZE + len(COUNTERS)
+
+
+class Metrics:
+    # semua angka ada di satu RawArray (shared memory) yang dibuat sebelum fork; tiap proses worker
+    # menulis ke slot-nya sendiri sehingga STATS/HTTP di proses mana pun bisa menjumlahkan semuanya
+    def __init__(self, slots=1):
+        self.slots = slots
+        self.values = multiprocessing.RawArray("d", slots * SLOT_SIZE)
+        self.slot = 0
+        self.lock = threading.Lock()
+
+    def use_slot(self, slot):
+        # dipanggil di proses worker setelah fork; gauge peninggalan worker sebelumnya direset
+        self.slot = slot
+        self.lock = threading.Lock()
+        for name in GAUGES:
+            self.values[slot * SLOT_SIZE + COUNTER_INDEX[name]] = 0
+
+    def add(self, name, amount=1):
+        i = self.slot * SLOT_SIZE + COUNTER_INDEX[name]
+        with self.lock:
+            self.values[i] += amount
+
+    def observe(self, command, seconds):
+        i = self.slot * SLOT_SIZE + COMMAND_INDEX.get(command, COMMAND_INDEX["OTHER"])
+        with self.lock:
+            self.values[i] += 1
+            self.values[i + 1] += seconds
+            self.values[i + 2 + bisect_left(BUCKETS, seconds)] += 1
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}_seconds", time.perf_counter() - start)
+
+    def totals(self):
+        values = self.values[:]
+        return [sum(values[slot * SLOT_SIZE + i] for slot in range(self.slots)) for i in range(SLOT_SIZE)]
+
+    def snapshot(self):
+        totals = self.totals()
+        commands = {}
+        for command, i in COMMAND_INDEX.items():
+            count = int(totals[i])
+            if not count:
+                continue
+            buckets = totals[i + 2:i + COMMAND_SIZE]
+            commands[command] = {
+                "count": count,
+                "latency_sum": round(totals[i + 1], 6),
+                "latency_avg": round(totals[i + 1] / count, 6),
+                "latency_buckets": {str(le): int(n) for le, n in zip(BUCKETS + ["+Inf"], buckets)},
+            }
+        hasil = {name: int(totals[COUNTER_INDEX[name]]) for name in COUNTERS if not name.endswith("_seconds")}
+        hasil["phases"] = {phase: round(totals[COUNTER_INDEX[f"{phase}_seconds"]], 6) for phase in PHASES}
+        hasil["commands"] = commands
+        hasil["workers"] = self.slots
+        return hasil
+
+    def prometheus(self):
+        totals = self.totals()
+        lines = ["# TYPE fileserver_request_seconds histogram"]
+        for command, i in COMMAND_INDEX.items():
+            if not totals[i]:
+                continue
+            cumulative = 0
+            for le, n in zip(BUCKETS + ["+Inf"], totals[i + 2:i + COMMAND_SIZE]):
+                cumulative += n
+                lines.append(f'fileserver_request_seconds_bucket{{command="{command}",le="{le}"}} {int(cumulative)}')
+            lines.append(f'fileserver_request_seconds_sum{{command="{command}"}} {totals[i + 1]}')
+            lines.append(f'fileserver_request_seconds_count{{command="{command}"}} {int(totals[i])}')
+        for name in COUNTERS:
+            if name.endswith("_seconds"):
+                continue
+            kind = "gauge" if name in GAUGES else "counter"
+            metric = f"fileserver_{name}" if kind == "gauge" else f"fileserver_{name}_total"
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {int(totals[COUNTER_INDEX[name]])}")
+        lines.append("# TYPE fileserver_phase_seconds_total counter")
+        for phase in PHASES:
+            lines.append(f'fileserver_phase_seconds_total{{phase="{phase}"}} {totals[COUNTER_INDEX[f"{phase}_seconds"]]}')
+        return "\n".join(lines) + "\n"
+
+
+class RequestMeter:
+    # waktu dan nama perintah yang sedang dilayani pada satu koneksi; recv/send hanya dihitung selama request
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.command = None
+        self.started = None
+
+    def begin(self):
+        self.command = None
+        self.started = time.perf_counter()
+
+    def end(self):
+        if self.started is not None:
+            self.metrics.observe(self.command or "OTHER", time.perf_counter() - self.started)
+            self.started = None
+
+    def _record(self, phase, start, counter, amount):
+        if self.started is not None:
+            self.metrics.add(f"{phase}_seconds", time.perf_counter() - start)
+        self.metrics.add(counter, amount)
+
+
+class MeteredSocket(RequestMeter):
+    # pembungkus socket client untuk mode thread/process
+    def __init__(self, sock, metrics):
+        RequestMeter.__init__(self, metrics)
+        self.sock = sock
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def recv(self, bufsize, *args):
+        start = time.perf_counter()
+        data = self.sock.recv(bufsize, *args)
+        self._record("recv", start, "bytes_in", len(data))
+        return data
+
+    def recv_into(self, buffer, nbytes=0, *args):
+        start = time.perf_counter()
+        n = self.sock.recv_into(buffer, nbytes, *args)
+        self._record("recv", start, "bytes_in", n)
+        return n
+
+    def sendall(self, data):
+        start = time.perf_counter()
+        self.sock.sendall(data)
+        self._record("send", start, "bytes_out", len(data))
+
+    def sendmsg(self, buffers, *args):
+        start = time.perf_counter()
+        sent = self.sock.sendmsg(buffers, *args)
+        self._record("send", start, "bytes_out", sent)
+        return sent
+
+    def sendfile(self, file, offset=0, count=None):
+        start = time.perf_counter()
+        sent = self.sock.sendfile(file, offset, count)
+        self._record("send", start, "bytes_out", sent)
+        return sent
+
+
+class MeteredStream:
+    # pembungkus asyncio.StreamReader; waktu dan byte dicatat ke meter milik writer koneksi yang sama
+    def __init__(self, stream, meter):
+        self.stream = stream
+        self.meter = meter
+
+    async def read(self, n=-1):
+        start = time.perf_counter()
+        data = await self.stream.read(n)
+        self.meter._record("recv", start, "bytes_in", len(data))
+        return data
+
+
+class MeteredWriter(RequestMeter):
+    # pembungkus asyncio.StreamWriter; waktu send = menunggu drain dan sendfile
+    def __init__(self, writer, metrics):
+        RequestMeter.__init__(self, metrics)
+        self.writer = writer
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+    def write(self, data):
+        self.writer.write(data)
+        self.metrics.add("bytes_out", len(data))
+
+    def writelines(self, buffers):
+        buffers = list(buffers)
+        self.writer.writelines(buffers)
+        self.metrics.add("bytes_out", sum(len(b) for b in buffers))
+
+    async def drain(self):
+        start = time.perf_counter()
+        await self.writer.drain()
+        self._record("send", start, "bytes_out", 0)
+
+    async def sendfile(self, file, offset=0, count=None):
+        start = time.perf_counter()
+        sent = await asyncio.get_running_loop().sendfile(self.writer.transport, file, offset, count)
+        self._record("send", start, "bytes_out", sent)
+        return sent
+
+
+def serve_http(metrics, port, host="127.0.0.1"):
+    # endpoint /metrics format teks Prometheus, dijalankan di thread daemon
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
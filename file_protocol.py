@@ -1,26 +1,165 @@
 import json
 import logging
-import shlex
 from file_interface import FileInterface
+from file_compression import split_encoding
+
+
+def split_request_id(string_datamasuk):
+    # request boleh diberi tag "#<id> " di depan; id dikembalikan di response untuk pipelining
+    if string_datamasuk.startswith("#"):
+        tag, _, rest = string_datamasuk.partition(" ")
+        return tag[1:], rest
+    return None, string_datamasuk
+
+
+def split_checksum(parts):
+    # token opsional "sha256=<hex>": digest data yang dikirim client, diverifikasi server sebelum disimpan
+    rest, digest = [], None
+    for part in parts:
+        if part.lower().startswith("sha256="):
+            digest = part[len("sha256="):].lower()
+        else:
+            rest.append(part)
+    return rest, digest
+
+
+def split_options(payload):
+    # token opsional "sha256=..." / "encoding=..." di depan payload base64 UPLOAD/UPLOADAT teks
+    options = []
+    while payload[:7].lower() == "sha256=" or payload[:9].lower() == "encoding=":
+        token, _, payload = payload.partition(" ")
+        options.append(token)
+    return options, payload
+
+
+def tokenize(string_datamasuk, limit=None):
+    # pecah header per spasi (token boleh diapit tanda kutip); setelah limit token, sisanya (payload)
+    # dikembalikan utuh sebagai satu slice tanpa dipindai sehingga biaya parsing hanya sebesar header
+    tokens = []
+    i, n = 0, len(string_datamasuk)
+    while i < n:
+        ch = string_datamasuk[i]
+        if ch.isspace():
+            i += 1
+            continue
+        if limit is not None and len(tokens) == limit:
+            tokens.append(string_datamasuk[i:].rstrip())
+            break
+        if ch in '"\'':
+            end = string_datamasuk.find(ch, i + 1)
+            if end < 0:
+                raise ValueError("tanda kutip tidak ditutup")
+            tokens.append(string_datamasuk[i + 1:end])
+        else:
+            end = string_datamasuk.find(" ", i)
+            if end < 0:
+                end = n
+            tokens.append(string_datamasuk[i:end])
+        i = end + 1
+    return tokens
+
 
 class FileProtocol:
     def __init__(self):
         self.file = FileInterface()
+        # perintah -> (fungsi, jumlah parameter header sebelum payload; None = tanpa payload)
+        self.commands = {
+            'list': (self.file.list, None),
+            'get': (self.file.get, None),
+            'upload': (self.file.upload, 1),
+            'uploadat': (self.file.uploadat, 2),
+            'size': (self.file.size, None),
+            'allocate': (self.file.allocate, None),
+            'delete': (self.file.delete, None),
+            'have': (self.file.have, None),
+            'link': (self.file.link, None),
+            'cachestats': (self.file.cachestats, None),
+            'stat': (self.file.stat, None),
+        }
 
     def proses_string(self, string_datamasuk=''):
-        logging.warning(f"string diproses: {string_datamasuk}")
-        c = shlex.split(string_datamasuk)
+        return json.dumps(self.proses_text(string_datamasuk))
+
+    def proses_text(self, string_datamasuk=''):
+        # sama seperti proses_string tetapi mengembalikan dict, untuk dikirim dengan text_response
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("string diproses: %s (%d bytes)", string_datamasuk[:64], len(string_datamasuk))
+        request_id, string_datamasuk = split_request_id(string_datamasuk.strip())
+        hasil = self.proses_request(string_datamasuk)
+        if request_id is not None:
+            hasil['id'] = request_id
+        return hasil
+
+    def proses_binary(self, string_datamasuk='', payload=b''):
+        # mode biner: isi file UPLOAD datang sebagai payload mentah, isi file GET dikembalikan terpisah
+        request_id, string_datamasuk = split_request_id(string_datamasuk.strip())
+        isifile = b''
+        try:
+            c = tokenize(string_datamasuk)
+        except ValueError:
+            c = []
+        c, expected = split_checksum(c)
+        # encoding= pada GET hanya daftar codec yang diterima client: isi dikirim apa adanya tanpa field encoding
+        c, encoding = split_encoding(c)
+        c_request = c[0].lower() if c else ''
+        if c_request == 'get':
+            hasil, isifile = self.file.get_raw(c[1:])
+        elif c_request == 'upload':
+            hasil = self.file.upload_raw(c[1:], payload, expected, encoding)
+        elif c_request == 'uploadat':
+            hasil = self.file.uploadat_raw(c[1:], payload, expected, encoding)
+        else:
+            hasil = self.proses_request(string_datamasuk)
+        if request_id is not None:
+            hasil['id'] = request_id
+        return hasil, isifile
+
+    def proses_request(self, string_datamasuk=''):
+        try:
+            if string_datamasuk[:6].upper() == "BATCH ":
+                return self.batch(string_datamasuk[6:])
+            c_request, _, rest = string_datamasuk.partition(" ")
+            c_request = c_request.strip().lower()
+            handler, limit = self.commands[c_request]
+            logging.debug("memproses request: %s", c_request)
+            params = tokenize(rest, limit)
+            if limit is not None and len(params) > limit:
+                # token opsional di antara parameter header dan payload (UPLOAD/UPLOADAT)
+                options, payload = split_options(params[limit])
+                options, expected = split_checksum(options)
+                _, encoding = split_encoding([c_request] + options)
+                return handler(params[:limit] + [payload], expected, encoding)
+            # GET x encoding=...: isi dikirim apa adanya (tanpa field encoding), token diabaikan
+            params = split_encoding([c_request] + params)[0][1:]
+            return handler(params)
+        except Exception as e:
+            return dict(status='ERROR', data='request tidak dikenali')
+
+    def batch(self, daftar_json, proses=None):
+        # BATCH ["DELETE a.txt", "#7 GET b.txt", ...] -> satu response berisi hasil tiap perintah;
+        # proses melayani satu perintah (default proses_request, server lain memakai storage-nya sendiri)
+        proses = proses or self.proses_request
         try:
-            c_request = c[0].strip().lower()
-            logging.warning(f"memproses request: {c_request}")
-            params = [x for x in c[1:]]
-            cl = getattr(self.file, c_request)(params)
-            return json.dumps(cl)
+            daftar = json.loads(daftar_json)
+            if not isinstance(daftar, list):
+                raise ValueError("BATCH membutuhkan list perintah")
         except Exception as e:
-            return json.dumps(dict(status='ERROR', data='request tidak dikenali'))
+            return dict(status='ERROR', data=f"BATCH tidak valid: {e}")
+        hasil = []
+        for perintah in daftar:
+            request_id, perintah = split_request_id(str(perintah).strip())
+            if perintah[:6].upper() == "BATCH ":
+                h = dict(status='ERROR', data='BATCH tidak boleh bersarang')
+            else:
+                h = proses(perintah)
+            if request_id is not None:
+                h['id'] = request_id
+            hasil.append(h)
+        return dict(status='OK', data=hasil)
 
 
 if __name__ == '__main__':
     fp = FileProtocol()
     print(fp.proses_string("LIST"))
     print(fp.proses_string("GET contoh.txt"))
+    print(fp.proses_string('BATCH ["LIST", "#2 GET contoh.txt"]'))
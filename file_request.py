@@ -0,0 +1,33 @@
+from file_protocol import split_checksum, split_request_id
+from file_compression import split_encoding
+from file_cluster import split_replica
+
+
+class Request:
+    # header request yang sudah diurai tanpa I/O, dipakai bersama handler mode thread/process dan asyncio:
+    # token "replica", "sha256=<hex>" dan "encoding=..." dipisahkan dari parts
+    def __init__(self, command_str, request_id=None):
+        self.command_str = command_str.strip()
+        self.request_id = request_id
+        parts, self.replica = split_replica(self.command_str.split(" "))
+        parts, self.checksum = split_checksum(parts)
+        self.parts, self.encoding = split_encoding(parts)
+        self.command = self.parts[0].upper()
+
+    @classmethod
+    def parse(cls, raw):
+        # perintah dengan id opsional di depan: "#<id> PERINTAH ..."
+        request_id, command_str = split_request_id(raw)
+        return cls(command_str, request_id)
+
+    @property
+    def raw(self):
+        return (f"#{self.request_id} " if self.request_id is not None else "") + self.command_str
+
+    @property
+    def args(self):
+        return self.parts[1:]
+
+    @property
+    def filename(self):
+        return self.parts[1] if len(self.parts) > 1 else None
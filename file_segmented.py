@@ -0,0 +1,58 @@
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+SEGMENT_SIZE = 8 * 1024 * 1024
+
+
+def split_segments(total, segment_size=SEGMENT_SIZE):
+    return [(offset, min(segment_size, total - offset)) for offset in range(0, total, segment_size)]
+
+
+def _check(hasil, what):
+    if not hasil or hasil.get('status') != 'OK':
+        raise IOError(f"{what} gagal: {hasil.get('data') if hasil else 'tidak ada response'}")
+    return hasil
+
+
+def parallel_download(send_command, filename, dest_path, binary=False, segment_size=SEGMENT_SIZE, concurrency=4):
+    # unduh file per segmen lewat beberapa koneksi sekaligus, tiap segmen ditulis langsung ke posisinya
+    total = _check(send_command(f"SIZE {filename}"), "SIZE")['size']
+    with open(dest_path, 'wb') as f:
+        f.truncate(total)
+        fd = f.fileno()
+
+        def fetch(segment):
+            offset, length = segment
+            hasil = _check(send_command(f"GET {filename} {offset} {length}"), f"GET segmen {offset}")
+            isi = hasil['payload'] if binary else base64.b64decode(hasil['data_file'])
+            if len(isi) != length:
+                raise IOError(f"segmen {offset}: menerima {len(isi)} dari {length} bytes")
+            os.pwrite(fd, isi, offset)
+            return length
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return sum(executor.map(fetch, split_segments(total, segment_size)))
+
+
+def parallel_upload(send_command, file_path, filename=None, binary=False, segment_size=SEGMENT_SIZE, concurrency=4):
+    # server menyiapkan file seukuran total dulu (ALLOCATE), lalu segmen dikirim bersamaan dengan UPLOADAT
+    filename = filename or os.path.basename(file_path)
+    total = os.path.getsize(file_path)
+    _check(send_command(f"ALLOCATE {filename} {total}"), "ALLOCATE")
+    with open(file_path, 'rb') as f:
+        fd = f.fileno()
+
+        def push(segment):
+            offset, length = segment
+            isi = os.pread(fd, length, offset)
+            command_str = f"UPLOADAT {filename} {offset}"
+            if binary:
+                hasil = send_command(command_str, isi)
+            else:
+                hasil = send_command(f"{command_str} {base64.b64encode(isi).decode()}")
+            _check(hasil, f"UPLOADAT segmen {offset}")
+            return length
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return sum(executor.map(push, split_segments(total, segment_size)))
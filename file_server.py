@@ -2,37 +2,93 @@ from socket import *
 import socket
 import threading
 import logging
+import queue
 import time
 import sys
+import os
+from dotenv import load_dotenv
 
+load_dotenv()
 
 from file_protocol import  FileProtocol
+from file_framing import MAGIC, TERMINATOR, SocketReader, read_request, pack_response, text_response, send_buffers
 fp = FileProtocol()
 
+# batas koneksi yang dilayani bersamaan, panjang antrean koneksi yang menunggu slot,
+# dan jatah byte yang boleh dikirim client dalam satu koneksi (0 = tanpa batas)
+MAX_CONNECTIONS = int(os.getenv("max_connections", "64"))
+ACCEPT_QUEUE = int(os.getenv("accept_queue", "128"))
+CONNECTION_BYTE_BUDGET = int(os.getenv("connection_byte_budget", "0"))
+IDLE_TIMEOUT = float(os.getenv("idle_timeout", "30"))
+# request teks tanpa "\r\n\r\n" (client lama) dianggap lengkap jika tidak ada data lanjutan selama ini (detik)
+LEGACY_WAIT = float(os.getenv("legacy_wait", "0.2"))
+
+
+def send_result(connection, hasil, binary=False):
+    if binary:
+        connection.sendall(pack_response(hasil))
+    else:
+        connection.sendall(text_response(hasil))
+
 
 class ProcessTheClient(threading.Thread):
-    def __init__(self, connection, address):
+    def __init__(self, connection, address, byte_budget=0, on_done=None):
         self.connection = connection
         self.address = address
+        self.byte_budget = byte_budget
+        self.on_done = on_done
         threading.Thread.__init__(self)
 
     def run(self):
-        while True:
-            data = self.connection.recv(32)
-            if data:
-                d = data.decode()
-                hasil = fp.proses_string(d)
-                hasil=hasil+"\r\n\r\n"
-                self.connection.sendall(hasil.encode())
-            else:
-                break
-        self.connection.close()
+        # baca ke buffer sampai satu pesan utuh: teks diakhiri "\r\n\r\n", biner memakai frame FBIN berpanjang
+        reader = SocketReader(self.connection, max_bytes=self.byte_budget)
+        try:
+            while True:
+                head = reader.peek(len(MAGIC))
+                if not head:
+                    break
+                binary = head == MAGIC
+                try:
+                    if binary:
+                        self.process_binary(reader)
+                    else:
+                        self.process_text(reader)
+                except ValueError as e:
+                    # frame rusak atau jatah byte koneksi habis: balas lalu tutup koneksi
+                    send_result(self.connection, dict(status='ERROR', data=str(e)), binary)
+                    break
+        except socket.timeout:
+            logging.warning(f"koneksi {self.address} idle terlalu lama, ditutup")
+        except Exception as e:
+            logging.warning(f"error pada koneksi {self.address}: {e}")
+        finally:
+            self.connection.close()
+            if self.on_done is not None:
+                self.on_done(self)
+
+    def process_binary(self, reader):
+        command_str, payload_len = read_request(reader)
+        hasil, isifile = fp.proses_binary(command_str, reader.read_exact(payload_len))
+        send_buffers(self.connection, [pack_response(hasil, len(isifile)), isifile])
+
+    def process_text(self, reader):
+        d = reader.read_until(TERMINATOR, LEGACY_WAIT or None).decode()
+        if not d.strip():
+            return
+        send_result(self.connection, fp.proses_text(d))
 
 
 class Server(threading.Thread):
-    def __init__(self,ipaddress='0.0.0.0',port=8889):
+    def __init__(self,ipaddress='0.0.0.0',port=8889,max_connections=MAX_CONNECTIONS,accept_queue=ACCEPT_QUEUE,
+                 byte_budget=CONNECTION_BYTE_BUDGET,idle_timeout=IDLE_TIMEOUT):
         self.ipinfo=(ipaddress,port)
-        self.the_clients = []
+        self.the_clients = set()
+        self.clients_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.pending = queue.Queue(accept_queue)
+        self.byte_budget = byte_budget
+        self.idle_timeout = idle_timeout
+        self.rejected = 0
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         threading.Thread.__init__(self)
@@ -40,14 +96,49 @@ class Server(threading.Thread):
     def run(self):
         logging.warning(f"server berjalan di ip address {self.ipinfo}")
         self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(1)
+        self.my_socket.listen(100)
+        threading.Thread(target=self.dispatch, daemon=True).start()
         while True:
-            self.connection, self.client_address = self.my_socket.accept()
-            logging.warning(f"connection from {self.client_address}")
+            connection, client_address = self.my_socket.accept()
+            logging.warning(f"connection from {client_address}")
+            try:
+                self.pending.put_nowait((connection, client_address))
+            except queue.Full:
+                self.reject(connection, client_address)
 
-            clt = ProcessTheClient(self.connection, self.client_address)
+    def dispatch(self):
+        # koneksi di antrean menunggu sampai ada slot kosong, jumlah thread client tidak pernah melebihi batas;
+        # slot diambil dulu supaya koneksi yang menunggu tetap terhitung di antrean (kapasitas = slot + antrean)
+        while True:
+            self.slots.acquire()
+            connection, client_address = self.pending.get()
+            connection.settimeout(self.idle_timeout or None)
+            clt = ProcessTheClient(connection, client_address, self.byte_budget, self.client_done)
+            with self.clients_lock:
+                self.the_clients.add(clt)
             clt.start()
-            self.the_clients.append(clt)
+
+    def client_done(self, clt):
+        with self.clients_lock:
+            self.the_clients.discard(clt)
+        self.slots.release()
+
+    def reject(self, connection, address):
+        # antrean penuh: langsung balas BUSY supaya client bisa mencoba lagi nanti
+        self.rejected += 1
+        logging.warning(f"server penuh, koneksi {address} ditolak")
+        try:
+            connection.setblocking(False)
+            try:
+                binary = connection.recv(len(MAGIC), socket.MSG_PEEK) == MAGIC
+            except BlockingIOError:
+                binary = False
+            connection.settimeout(1)
+            send_result(connection, dict(status='BUSY', data='server sibuk, coba lagi nanti'), binary)
+        except OSError:
+            pass
+        finally:
+            connection.close()
 
 
 def main():
@@ -57,4 +148,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,495 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def allocate_file(filename, size):
+    # siapkan file dengan ukuran tepat size byte (dipotong atau diperpanjang) untuk upload per segmen
+    if size < 0:
+        raise ValueError("ukuran tidak valid")
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        if size and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+    finally:
+        os.close(fd)
+
+
+def open_in_place(filepath, offset):
+    # offset angka: tulis mulai offset tanpa memotong file; "end": tambahkan di akhir file
+    if offset == "end":
+        return os.fdopen(os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644), "ab")
+    if offset < 0:
+        raise ValueError("Invalid offset")
+    f = os.fdopen(os.open(filepath, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+    f.seek(offset)
+    return f
+
+
+class GroupCommit:
+    # fsync upload yang selesai bersamaan digabung dalam satu batch: satu thread (leader) menunggu
+    # sebentar agar upload lain ikut, melakukan fsync untuk semuanya, lalu membangunkan yang menunggu
+    def __init__(self, window=0.005):
+        self.window = window
+        self.cond = threading.Condition()
+        self.pending = []
+        self.started = 0
+        self.finished = 0
+        self.leader = False
+        self.errors = {}
+
+    def sync(self, fd):
+        with self.cond:
+            self.pending.append(fd)
+            batch = self.started + 1
+            while self.finished < batch:
+                if self.leader:
+                    self.cond.wait()
+                    continue
+                self.leader = True
+                self.cond.release()
+                try:
+                    time.sleep(self.window)
+                finally:
+                    self.cond.acquire()
+                fds, self.pending = self.pending, []
+                self.started += 1
+                current = self.started
+                self.cond.release()
+                error = None
+                try:
+                    for pending_fd in fds:
+                        os.fsync(pending_fd)
+                except OSError as e:
+                    error = e
+                finally:
+                    self.cond.acquire()
+                    self.leader = False
+                    self.finished = current
+                    if error is not None:
+                        self.errors[current] = error
+                    self.errors.pop(current - 64, None)
+                    self.cond.notify_all()
+            error = self.errors.get(batch)
+        if error is not None:
+            raise error
+
+
+class Durability:
+    # fsync: "none" = serahkan ke page cache, "close" = fsync tiap file sebelum rename,
+    # "group" = fsync digabung antar upload yang bersamaan (GroupCommit)
+    def __init__(self, mode=None):
+        if mode is None:
+            mode = os.getenv("fsync", "none")
+        if mode not in ("none", "close", "group"):
+            raise ValueError(f"mode fsync tidak dikenal: {mode}")
+        self.mode = mode
+        self.group = GroupCommit(float(os.getenv("group_commit_ms", "5")) / 1000) if mode == "group" else None
+
+    def _sync_fd(self, fd):
+        if self.mode == "close":
+            os.fsync(fd)
+        elif self.mode == "group":
+            self.group.sync(fd)
+
+    def sync_file(self, f):
+        if self.mode != "none":
+            self._sync_fd(f.fileno())
+
+    def sync_dir(self, dirpath):
+        # rename baru tahan crash setelah entri direktorinya ikut di-fsync
+        if self.mode == "none":
+            return
+        try:
+            fd = os.open(dirpath or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            self._sync_fd(fd)
+        finally:
+            os.close(fd)
+
+
+class FileLock:
+    def __init__(self, fd):
+        self.fd = fd
+
+    def release(self):
+        # menutup fd sekaligus melepas flock
+        os.close(self.fd)
+
+
+class FileLocks:
+    # kunci per nama file, dibagi ke STRIPES slot; memakai flock agar berlaku juga antar proses worker.
+    # shared dipakai penulisan sebagian (UPLOADAT paralel tetap jalan bersamaan),
+    # exclusive dipakai rename/hapus/alokasi
+    STRIPES = 256
+
+    def __init__(self, root):
+        self.lock_dir = os.path.join(root, ".locks")
+        self.thread_locks = [threading.Lock() for _ in range(self.STRIPES)] if fcntl is None else None
+
+    def acquire(self, filename, shared=False):
+        slot = zlib.crc32(filename.encode()) % self.STRIPES
+        if fcntl is None:
+            lock = self.thread_locks[slot]
+            lock.acquire()
+            return lock
+        os.makedirs(self.lock_dir, exist_ok=True)
+        fd = os.open(os.path.join(self.lock_dir, str(slot)), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        return FileLock(fd)
+
+    @contextmanager
+    def exclusive(self, filename):
+        lock = self.acquire(filename)
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+class FileUpload:
+    # tulisan satu upload; commit() mengembalikan ukuran file, abort() membatalkan.
+    # tmp_path diisi jika upload ditulis ke file sementara dan baru dipasang ke nama file saat commit
+    def __init__(self, storage, filename, f, tmp_path=None, lock=None):
+        self.storage = storage
+        self.filename = filename
+        self.filepath = storage.path(filename)
+        self.f = f
+        self.tmp_path = tmp_path
+        self.lock = lock
+        # os.stat file setelah dipasang (hanya untuk upload lewat file sementara)
+        self.stat = None
+        # rentang byte yang ditulis upload ini [start, end), dipakai untuk replikasi UPLOADAT
+        self.start = f.tell()
+        self.end = None
+        # sha256 dihitung sambil data ditulis: isi file utuh untuk upload baru, rentang yang ditulis
+        # untuk tulisan di tempat (UPLOADAT)
+        self.hash = hashlib.sha256()
+        self.digest = None
+        self.size = None
+
+    def write(self, data):
+        self.hash.update(data)
+        self.f.write(data)
+
+    def commit(self):
+        try:
+            with self.f:
+                self.end = self.f.tell()
+                self.f.flush()
+                self.storage.durability.sync_file(self.f)
+                self.size = os.fstat(self.f.fileno()).st_size
+            self.digest = self.hash.hexdigest()
+            if self.tmp_path is not None:
+                self.storage._install(self)
+            return self.size
+        finally:
+            self._release()
+
+    def abort(self):
+        self.f.close()
+        if self.tmp_path is not None:
+            try:
+                os.unlink(self.tmp_path)
+            except OSError:
+                pass
+        self._release()
+
+    def _release(self):
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+
+
+class PlainStorage:
+    # setiap nama file disimpan apa adanya di direktori root
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+        self.sums_dir = os.path.join(root, ".sums")
+        self.locks = FileLocks(root)
+        self.durability = Durability()
+
+    def path(self, filename):
+        return os.path.join(self.root, filename)
+
+    def _tmp_file(self, tmp_dir):
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir, prefix="tmp-")
+        os.fchmod(fd, 0o644)
+        return os.fdopen(fd, "wb"), tmp
+
+    def open_upload(self, filename, offset=None):
+        # offset None: isi baru ditulis ke file sementara lalu di-rename, pembaca tidak pernah melihat file setengah jadi
+        os.makedirs(self.root, exist_ok=True)
+        if offset is None:
+            f, tmp = self._tmp_file(self.tmp_dir)
+            return FileUpload(self, filename, f, tmp)
+        return self._open_in_place(filename, offset)
+
+    def _open_in_place(self, filename, offset):
+        lock = self.locks.acquire(filename, shared=True)
+        try:
+            return FileUpload(self, filename, open_in_place(self.path(filename), offset), lock=lock)
+        except BaseException:
+            lock.release()
+            raise
+
+    def _install(self, upload):
+        with self.locks.exclusive(upload.filename):
+            os.replace(upload.tmp_path, upload.filepath)
+            upload.stat = os.stat(upload.filepath)
+            self._set_checksum(upload.filename, upload.digest, upload.stat)
+        self.durability.sync_dir(os.path.dirname(upload.filepath))
+
+    def _sum_path(self, filename):
+        return os.path.join(self.sums_dir, quote(filename, safe=""))
+
+    def checksum(self, filename, st=None):
+        # sha256 yang tersimpan saat upload; None jika belum ada atau file sudah berubah sejak itu
+        # (dicek dari inode, ukuran dan mtime sehingga tulisan di tempat otomatis membuatnya basi)
+        try:
+            with open(self._sum_path(filename)) as f:
+                digest, ino, size, mtime_ns = f.read().split()
+            st = st or os.stat(self.path(filename))
+        except (OSError, ValueError):
+            return None
+        if (st.st_ino, st.st_size, st.st_mtime_ns) != (int(ino), int(size), int(mtime_ns)):
+            return None
+        return digest
+
+    def compute_checksum(self, filename):
+        # hitung ulang dari isi file (misal setelah UPLOADAT) lalu simpan untuk request berikutnya
+        with open(self.path(filename), "rb") as f:
+            st = os.fstat(f.fileno())
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        if os.stat(self.path(filename)).st_mtime_ns == st.st_mtime_ns:
+            self._set_checksum(filename, h.hexdigest(), st)
+        return h.hexdigest()
+
+    def _set_checksum(self, filename, digest, st=None):
+        sum_path = self._sum_path(filename)
+        if digest is None:
+            try:
+                os.unlink(sum_path)
+            except FileNotFoundError:
+                pass
+            return
+        os.makedirs(self.sums_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.sums_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{digest} {st.st_ino} {st.st_size} {st.st_mtime_ns}")
+        os.replace(tmp, sum_path)
+
+    def allocate(self, filename, size):
+        os.makedirs(self.root, exist_ok=True)
+        with self.locks.exclusive(filename):
+            allocate_file(self.path(filename), size)
+
+    def delete(self, filename):
+        with self.locks.exclusive(filename):
+            os.remove(self.path(filename))
+            self._set_checksum(filename, None)
+
+    def have(self, digest):
+        return False
+
+    def link(self, filename, digest):
+        raise ValueError("storage tidak mendukung deduplikasi")
+
+
+class DedupStorage(PlainStorage):
+    # isi file disimpan sekali per digest sha256 di .blobs/, nama file adalah hardlink ke blob
+    # dan .meta/<nama> mencatat digest-nya; blob tanpa nama lagi dihapus
+    def __init__(self, root):
+        PlainStorage.__init__(self, root)
+        self.blob_dir = os.path.join(root, ".blobs")
+        self.meta_dir = os.path.join(root, ".meta")
+
+    def blob_path(self, digest):
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"digest tidak valid: {digest}")
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _meta_path(self, filename):
+        return os.path.join(self.meta_dir, quote(filename, safe=""))
+
+    def digest(self, filename):
+        try:
+            with open(self._meta_path(filename)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def checksum(self, filename, st=None):
+        # blob tidak pernah diubah (tulisan di tempat memisahkan file dari blob lebih dulu), jadi
+        # digest di .meta selalu sesuai isi; file yang sudah dipisah memakai .sums seperti PlainStorage
+        return self.digest(filename) or PlainStorage.checksum(self, filename, st)
+
+    def _set_digest(self, filename, digest):
+        os.makedirs(self.meta_dir, exist_ok=True)
+        meta_path = self._meta_path(filename)
+        if digest is None:
+            try:
+                os.unlink(meta_path)
+            except FileNotFoundError:
+                pass
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.meta_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(digest)
+        os.replace(tmp, meta_path)
+
+    def open_upload(self, filename, offset=None):
+        if offset is None:
+            f, tmp = self._tmp_file(self.blob_dir)
+            return FileUpload(self, filename, f, tmp)
+        os.makedirs(self.root, exist_ok=True)
+        with self.locks.exclusive(filename):
+            self._unshare(filename)
+        return self._open_in_place(filename, offset)
+
+    def _install(self, upload):
+        digest = upload.digest
+        with self.locks.exclusive(upload.filename):
+            self._store(upload.filename, upload.tmp_path, digest)
+            upload.stat = os.stat(upload.filepath)
+        self.durability.sync_dir(os.path.dirname(self.blob_path(digest)))
+        self.durability.sync_dir(os.path.dirname(upload.filepath))
+
+    def _store(self, filename, tmp, digest):
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            while True:
+                try:
+                    os.link(tmp, blob)
+                    # isi baru: tmp sendiri sudah menjadi link ke blob
+                    self._replace(filename, tmp, digest)
+                    return
+                except FileExistsError:
+                    pass
+                # isi yang sama sudah ada: tulisan tmp dibuang, nama file diarahkan ke blob lama
+                try:
+                    self._link(filename, digest)
+                    return
+                except FileNotFoundError:
+                    # blob baru saja dihapus oleh DELETE lain, simpan ulang dari tmp
+                    continue
+        finally:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+
+    def _link_tmp(self, source):
+        link_tmp = os.path.join(self.blob_dir, f"tmp-{uuid.uuid4().hex}")
+        os.link(source, link_tmp)
+        return link_tmp
+
+    def _replace(self, filename, link_tmp, digest):
+        # link_tmp (hardlink ke blob) menggantikan nama file secara atomik
+        old_digest = self.digest(filename)
+        filepath = self.path(filename)
+        try:
+            # nama file sudah menunjuk ke blob yang sama: os.replace antar hardlink satu inode tidak
+            # melakukan apa-apa dan link_tmp akan tertinggal, menahan blob dari _collect
+            if not (os.path.exists(filepath) and os.path.samefile(filepath, link_tmp)):
+                os.replace(link_tmp, filepath)
+        finally:
+            try:
+                os.unlink(link_tmp)
+            except FileNotFoundError:
+                pass
+        self._set_digest(filename, digest)
+        if old_digest and old_digest != digest:
+            self._collect(old_digest)
+
+    def _collect(self, digest):
+        # hapus blob yang sudah tidak dipakai nama file mana pun
+        blob = self.blob_path(digest)
+        try:
+            if os.stat(blob).st_nlink == 1:
+                os.unlink(blob)
+        except FileNotFoundError:
+            pass
+
+    def _unshare(self, filename):
+        # sebelum ditulis sebagian (UPLOADAT/ALLOCATE) file dipisah dari blob supaya nama lain tidak ikut berubah
+        old_digest = self.digest(filename)
+        if old_digest is None:
+            return
+        filepath = self.path(filename)
+        if os.path.exists(filepath) and os.stat(filepath).st_nlink > 1:
+            f, tmp = self._tmp_file(self.blob_dir)
+            with f, open(filepath, "rb") as src:
+                shutil.copyfileobj(src, f, 1024 * 1024)
+                f.flush()
+                self.durability.sync_file(f)
+            os.replace(tmp, filepath)
+        self._set_digest(filename, None)
+        self._collect(old_digest)
+
+    def allocate(self, filename, size):
+        os.makedirs(self.root, exist_ok=True)
+        with self.locks.exclusive(filename):
+            self._unshare(filename)
+            allocate_file(self.path(filename), size)
+
+    def delete(self, filename):
+        with self.locks.exclusive(filename):
+            old_digest = self.digest(filename)
+            os.remove(self.path(filename))
+            self._set_checksum(filename, None)
+            if old_digest is not None:
+                self._set_digest(filename, None)
+                self._collect(old_digest)
+
+    def have(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def link(self, filename, digest):
+        # pasang nama file ke blob yang sudah ada tanpa mengirim ulang isinya
+        os.makedirs(self.root, exist_ok=True)
+        with self.locks.exclusive(filename):
+            size = self._link(filename, digest)
+        self.durability.sync_dir(os.path.dirname(self.path(filename)))
+        return size
+
+    def _link(self, filename, digest):
+        blob = self.blob_path(digest)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._replace(filename, self._link_tmp(blob), digest)
+        return os.path.getsize(self.path(filename))
+
+
+def make_storage(root, kind=None):
+    if kind is None:
+        kind = os.getenv("storage", "plain")
+    if kind == "dedup":
+        return DedupStorage(root)
+    if kind == "plain":
+        return PlainStorage(root)
+    raise ValueError(f"storage tidak dikenal: {kind}")
@@ -1,19 +1,61 @@
 import socket
 import json
-import base64
+import binascii
 import logging
 import os
+import threading
 import time
 import concurrent.futures
 import statistics
 import csv
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
+from file_framing import TERMINATOR, SocketReader, pack_request, read_response
+from file_connection_pool import ConnectionPool
+from file_segmented import parallel_download, parallel_upload
 
 load_dotenv()
 
 SERVER_IP = os.getenv("ip_server", "127.0.0.1")
 SERVER_PORT = int(os.getenv("port_server", "6666"))
+# potongan baca saat membuat base64 file uji (kelipatan 3 sehingga hasil tiap potongan bisa langsung disambung)
+B64_CHUNK = 3 * 1024 * 1024
+RECV_BUFFER = 1024 * 1024
+
+class _Base64Sink:
+    # decoder base64 streaming ke file; tanpa file, potongan base64 dikumpulkan apa adanya
+    def __init__(self, f=None):
+        self.f = f
+        self.parts = []
+        self.pending = b""
+        self.size = 0
+
+    def _write(self, data: bytes) -> None:
+        self.f.write(data)
+        self.size += len(data)
+
+    def feed(self, view: memoryview) -> None:
+        if self.f is None:
+            self.parts.append(bytes(view))
+            return
+        if self.pending:
+            k = min(4 - len(self.pending), len(view))
+            self.pending += bytes(view[:k])
+            view = view[k:]
+            if len(self.pending) < 4:
+                return
+            self._write(binascii.a2b_base64(self.pending))
+            self.pending = b""
+        aligned = len(view) - len(view) % 4
+        if aligned:
+            self._write(binascii.a2b_base64(view[:aligned]))
+        self.pending = bytes(view[aligned:])
+
+    def flush(self) -> None:
+        if self.f is not None and self.pending:
+            self._write(binascii.a2b_base64(self.pending))
+            self.pending = b""
+
 
 class InteractiveStressTester:
     def __init__(self):
@@ -21,6 +63,22 @@ class InteractiveStressTester:
         self.logger = self._configure_logging()
         self.server_address = self._get_server_address()
         self.test_results = []
+        self.protocol = 'text'
+        self.pool = None
+        self.segments = 1
+        # buffer terima per thread, dipakai ulang antar request dan hanya membesar jika perlu
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # ProcessPoolExecutor mem-pickle tester; hasil sebelumnya dan buffer tidak ikut dikirim ke proses worker
+        state = self.__dict__.copy()
+        state['test_results'] = []
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
 
     def _setup_directories(self) -> None:
         os.makedirs('test_files', exist_ok=True)
@@ -89,6 +147,21 @@ class InteractiveStressTester:
         exec_choice = input("Choose executor type (1-3): ").strip()
         params['executor'] = ['thread', 'process', 'both'][int(exec_choice)-1]
 
+        print("\nProtocol:")
+        print("1. Text (JSON + base64)\n2. Binary (raw payload)")
+        protocol_choice = input("Choose protocol (1-2): ").strip()
+        params['protocol'] = 'binary' if protocol_choice == '2' else 'text'
+
+        print("\nConnections:")
+        print("1. One-shot (new connection per request)\n2. Keep-alive (shared connection pool)")
+        connection_choice = input("Choose connection mode (1-2): ").strip()
+        params['connection'] = 'keep-alive' if connection_choice == '2' else 'one-shot'
+
+        print("\nSegments per transfer (parallel connections per file):")
+        print("1. 1 (single stream)\n2. 4\n3. 8")
+        segment_choice = input("Choose option (1-3): ").strip()
+        params['segments'] = {'2': 4, '3': 8}.get(segment_choice, 1)
+
         return params
 
     def _generate_test_file(self, size_mb: int) -> str:
@@ -103,40 +176,156 @@ class InteractiveStressTester:
                 f.write(os.urandom(1024 * 1024))
         return filepath
 
-    def _send_command(self, command_str: str = "") -> dict:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(600)
+    def _send_command(self, command_str: str = "", payload: bytes = b"", payload_file: Optional[str] = None,
+                      sink: Optional[str] = None) -> dict:
+        # payload_file: isi request dikirim langsung dari file dengan sendfile (mentah untuk biner,
+        # hasil _encoded_payload untuk teks); sink: isi file GET ditulis langsung ke path ini
+        exchange = self._exchange_binary if self.protocol == 'binary' else self._exchange_text
         try:
-            sock.connect(self.server_address)
-            for i in range(0, len(command_str), 65536):
-                sock.sendall(command_str[i:i+65536].encode())
-            sock.sendall("\r\n\r\n".encode())
-
-            data_received = ""
-            while True:
-                data = sock.recv(1024*1024)
-                if data:
-                    data_received += data.decode()
-                    if "\r\n\r\n" in data_received:
-                        break
-                else:
-                    break
-            json_response = data_received.split("\r\n\r\n")[0]
-            return json.loads(json_response)
+            if self.pool is not None:
+                return self.pool.request(lambda sock: exchange(sock, command_str, payload, payload_file, sink))
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.settimeout(600)
+            try:
+                sock.connect(self.server_address)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                return exchange(sock, command_str, payload, payload_file, sink)
+            finally:
+                sock.close()
         except Exception as e:
             return {'status': 'ERROR', 'data': str(e)}
+
+    def _exchange_text(self, sock: socket.socket, command_str: str, payload: bytes = b"",
+                       payload_file: Optional[str] = None, sink: Optional[str] = None) -> dict:
+        for i in range(0, len(command_str), 65536):
+            sock.sendall(command_str[i:i+65536].encode())
+        if payload_file is not None:
+            sock.sendall(b" ")
+            with open(payload_file, 'rb') as f:
+                sock.sendfile(f)
+        sock.sendall(TERMINATOR)
+        return self._receive_text(sock, sink)
+
+    def _receive_text(self, sock: socket.socket, sink: Optional[str] = None) -> dict:
+        # response dibaca per potongan ke buffer tetap milik thread ini; isi data_file (base64) didekode sambil
+        # diterima langsung ke sink, sehingga response utuh tidak pernah ada di memori atau di-parse sebagai JSON
+        buf = getattr(self._local, 'buffer', None)
+        if buf is None:
+            buf = self._local.buffer = bytearray(RECV_BUFFER)
+        key_marker = b'"data_file":'
+        head = bytearray()
+        tail = bytearray()
+        decoder = None
+        state = 'head'
+        # posisi marker data_file di head, disimpan begitu ditemukan: tanda kutip pembukanya bisa baru
+        # datang pada recv berikutnya
+        key = -1
+        try:
+            with memoryview(buf) as view:
+                while True:
+                    n = sock.recv_into(view)
+                    if not n:
+                        raise ConnectionError("connection closed by server")
+                    start = 0
+                    if state == 'head':
+                        searched = max(0, len(head) - len(key_marker))
+                        head += view[:n]
+                        if key < 0:
+                            key = head.find(key_marker, searched)
+                        end = head.find(TERMINATOR, max(0, searched - len(TERMINATOR)))
+                        if end >= 0 and (key < 0 or end < key):
+                            return json.loads(bytes(head[:end]))
+                        quote = head.find(b'"', key + len(key_marker)) if key >= 0 else -1
+                        if quote < 0:
+                            continue
+                        # semua byte setelah tanda kutip pembuka berasal dari potongan ini: awal isi base64
+                        start = n - (len(head) - quote - 1)
+                        del head[quote + 1:]
+                        decoder = _Base64Sink(open(sink, 'wb') if sink is not None else None)
+                        state = 'data'
+                    if state == 'data':
+                        close = buf.find(b'"', start, n)
+                        with view[start:n if close < 0 else close] as part:
+                            decoder.feed(part)
+                        if close < 0:
+                            continue
+                        decoder.flush()
+                        start = close
+                        state = 'tail'
+                    tail += view[start:n]
+                    end = tail.find(TERMINATOR)
+                    if end >= 0:
+                        result = json.loads(bytes(head) + bytes(tail[:end]))
+                        if decoder.f is None:
+                            result['data_file'] = b"".join(decoder.parts)
+                        else:
+                            result['payload_size'] = decoder.size
+                        return result
         finally:
-            sock.close()
+            if decoder is not None and decoder.f is not None:
+                decoder.f.close()
+
+    def _exchange_binary(self, sock: socket.socket, command_str: str, payload: bytes = b"",
+                         payload_file: Optional[str] = None, sink: Optional[str] = None) -> dict:
+        if payload_file is not None:
+            sock.sendall(pack_request(command_str, os.path.getsize(payload_file)))
+            with open(payload_file, 'rb') as f:
+                sock.sendfile(f)
+        else:
+            sock.sendall(pack_request(command_str, len(payload)))
+            if payload:
+                sock.sendall(payload)
+        reader = SocketReader(sock)
+        result, payload_len = read_response(reader)
+        if sink is None:
+            result['payload'] = reader.read_exact(payload_len)
+        else:
+            with open(sink, 'wb') as f:
+                for chunk in reader.iter_exact(payload_len):
+                    f.write(chunk)
+            result['payload_size'] = payload_len
+        return result
+
+    def _encoded_payload(self, file_path: str) -> str:
+        # base64 file uji dibuat sekali di disk lalu dikirim dengan sendfile oleh semua worker (thread maupun
+        # proses), sehingga isinya hanya ada sekali di page cache dan tidak disalin ke memori tiap worker
+        encoded_path = file_path + '.b64'
+        if os.path.exists(encoded_path) and os.path.getmtime(encoded_path) >= os.path.getmtime(file_path):
+            return encoded_path
+        tmp_path = f"{encoded_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        buf = bytearray(B64_CHUNK)
+        with open(file_path, 'rb') as src, open(tmp_path, 'wb') as dst, memoryview(buf) as view:
+            while True:
+                n = src.readinto(buf)
+                if not n:
+                    break
+                with view[:n] as chunk:
+                    dst.write(binascii.b2a_base64(chunk, newline=False))
+        os.replace(tmp_path, encoded_path)
+        return encoded_path
+
+    def _segment_size(self, file_size: int) -> int:
+        return max(1, -(-file_size // self.segments))
+
+    def _upload_command(self, file_path: str) -> dict:
+        if self.segments > 1:
+            try:
+                total = parallel_upload(self._send_command, file_path, binary=self.protocol == 'binary',
+                                        segment_size=self._segment_size(os.path.getsize(file_path)),
+                                        concurrency=self.segments)
+                return {'status': 'OK', 'data': f"{total} bytes uploaded in {self.segments} segments"}
+            except Exception as e:
+                return {'status': 'ERROR', 'data': str(e)}
+        if self.protocol == 'binary':
+            return self._send_command(f"UPLOAD {os.path.basename(file_path)}", payload_file=file_path)
+        return self._send_command(f"UPLOAD {os.path.basename(file_path)}", payload_file=self._encoded_payload(file_path))
 
     def _perform_upload(self, file_path: str, worker_id: int) -> dict:
         start = time.time()
         try:
             file_size = os.path.getsize(file_path)
             self.logger.info(f"Worker {worker_id}: Uploading {os.path.basename(file_path)} ({file_size/1024/1024:.2f} MB)")
-            with open(file_path, 'rb') as fp:
-                content = base64.b64encode(fp.read()).decode()
-            cmd = f"UPLOAD {os.path.basename(file_path)} {content}"
-            result = self._send_command(cmd)
+            result = self._upload_command(file_path)
             duration = time.time() - start
             throughput = file_size / duration if duration > 0 else 0
             self.logger.info(f"Worker {worker_id}: Upload completed in {duration:.2f}s, {throughput/1024/1024:.2f} MB/s")
@@ -158,16 +347,16 @@ class InteractiveStressTester:
         start = time.time()
         try:
             self.logger.info(f"Worker {worker_id}: Downloading {file_name}")
-            result = self._send_command(f"GET {file_name}")
+            if self.segments > 1:
+                return self._perform_segmented_download(file_name, worker_id, start)
+            result = self._send_command(f"GET {file_name}", sink=os.path.join('downloads', f"{worker_id}_{file_name}"))
             duration = time.time() - start
             if result['status'] == 'OK':
-                filedata = base64.b64decode(result['data_file'])
-                with open(os.path.join('downloads', f"{worker_id}_{file_name}"), 'wb') as f:
-                    f.write(filedata)
-                throughput = len(filedata) / duration if duration > 0 else 0
+                size = result['payload_size']
+                throughput = size / duration if duration > 0 else 0
                 self.logger.info(f"Worker {worker_id}: Download completed in {duration:.2f}s, {throughput/1024/1024:.2f} MB/s")
                 return {
-                    'worker_id': worker_id, 'operation': 'download', 'file_size': len(filedata),
+                    'worker_id': worker_id, 'operation': 'download', 'file_size': size,
                     'duration': duration, 'throughput': throughput,
                     'status': 'OK', 'error': ''
                 }
@@ -185,6 +374,20 @@ class InteractiveStressTester:
                 'status': 'ERROR', 'error': str(e)
             }
 
+    def _perform_segmented_download(self, file_name: str, worker_id: int, start: float) -> dict:
+        size = self._send_command(f"SIZE {file_name}").get('size', 0)
+        total = parallel_download(self._send_command, file_name, os.path.join('downloads', f"{worker_id}_{file_name}"),
+                                  binary=self.protocol == 'binary', segment_size=self._segment_size(size),
+                                  concurrency=self.segments)
+        duration = time.time() - start
+        throughput = total / duration if duration > 0 else 0
+        self.logger.info(f"Worker {worker_id}: Download completed in {duration:.2f}s, {throughput/1024/1024:.2f} MB/s ({self.segments} segments)")
+        return {
+            'worker_id': worker_id, 'operation': 'download', 'file_size': total,
+            'duration': duration, 'throughput': throughput,
+            'status': 'OK', 'error': ''
+        }
+
     def _run_test(self, operation: str, config: Dict) -> List[Dict]:
         results = []
         for server_pool in config['server_pools']:
@@ -196,25 +399,10 @@ class InteractiveStressTester:
                     executors = ['thread', 'process'] if config['executor'] == 'both' else [config['executor']]
                     for executor in executors:
                         print(f"\nRunning {operation} test - File: {file_size}MB, Clients: {client_pool}, Executor: {executor}")
-                        executor_cls = (concurrent.futures.ThreadPoolExecutor if executor == 'thread' else concurrent.futures.ProcessPoolExecutor)
-                        all_results = []
-                        with executor_cls(max_workers=client_pool) as executor_obj:
-                            if operation == 'upload':
-                                futures = [executor_obj.submit(self._perform_upload, file_path, i) for i in range(client_pool)]
-                            else:
-                                if not self._ensure_file_exists(file_path):
-                                    print("Failed to upload test file for download operation")
-                                    continue
-                                futures = [executor_obj.submit(self._perform_download, os.path.basename(file_path), i) for i in range(client_pool)]
-                            for future in concurrent.futures.as_completed(futures):
-                                try:
-                                    all_results.append(future.result())
-                                except Exception as e:
-                                    all_results.append({
-                                        'worker_id': -1, 'operation': operation, 'file_size': 0,
-                                        'duration': 0, 'throughput': 0,
-                                        'status': 'ERROR', 'error': str(e)
-                                    })
+                        if operation != 'upload' and not self._ensure_file_exists(file_path):
+                            print("Failed to upload test file for download operation")
+                            continue
+                        all_results = self._run_round(operation, file_path, client_pool, executor)
                         stats = self._calculate_statistics(all_results, operation, file_size, client_pool, server_pool, executor)
                         results.append(stats)
                         print("\n=== Test Results ===")
@@ -222,12 +410,32 @@ class InteractiveStressTester:
                             print(f"{k:20}: {v}")
         return results
 
+    def _run_round(self, operation: str, file_path: str, client_pool: int, executor: str) -> List[Dict]:
+        # satu putaran: client_pool operasi dijalankan bersamaan, file untuk download harus sudah ada di server
+        executor_cls = (concurrent.futures.ThreadPoolExecutor if executor == 'thread' else concurrent.futures.ProcessPoolExecutor)
+        if operation == 'upload' and self.protocol == 'text' and self.segments == 1:
+            # siapkan base64 sekali sebelum worker mulai supaya semua worker memakai file yang sama
+            self._encoded_payload(file_path)
+        all_results = []
+        with executor_cls(max_workers=client_pool) as executor_obj:
+            if operation == 'upload':
+                futures = [executor_obj.submit(self._perform_upload, file_path, i) for i in range(client_pool)]
+            else:
+                futures = [executor_obj.submit(self._perform_download, os.path.basename(file_path), i) for i in range(client_pool)]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    all_results.append(future.result())
+                except Exception as e:
+                    all_results.append({
+                        'worker_id': -1, 'operation': operation, 'file_size': 0,
+                        'duration': 0, 'throughput': 0,
+                        'status': 'ERROR', 'error': str(e)
+                    })
+        return all_results
+
     def _ensure_file_exists(self, file_path: str) -> bool:
         try:
-            with open(file_path, 'rb') as fp:
-                content = base64.b64encode(fp.read()).decode()
-            cmd = f"UPLOAD {os.path.basename(file_path)} {content}"
-            result = self._send_command(cmd)
+            result = self._upload_command(file_path)
             return result['status'] == 'OK'
         except Exception:
             return False
@@ -241,6 +449,9 @@ class InteractiveStressTester:
             'client_pool_size': client_pool,
             'server_pool_size': server_pool,
             'executor_type': executor,
+            'protocol': self.protocol,
+            'connection': 'keep-alive' if self.pool is not None else 'one-shot',
+            'segments': self.segments,
             'success_count': sum(1 for r in results if r['status'] == 'OK'),
             'fail_count': sum(1 for r in results if r['status'] != 'OK'),
             'avg_duration': statistics.mean(durations) if durations else 0,
@@ -274,9 +485,15 @@ class InteractiveStressTester:
         print("File Server Stress Tester")
         print("="*40)
         params = self._get_test_parameters()
+        self.protocol = params['protocol']
+        self.segments = params['segments']
+        if params['connection'] == 'keep-alive':
+            self.pool = ConnectionPool(self.server_address, max_idle=max(params['client_pools']) * self.segments, timeout=600)
         self.test_results.extend(self._run_test('upload', params))
         self.test_results.extend(self._run_test('download', params))
         self._save_results()
+        if self.pool is not None:
+            self.pool.close()
         print("\nTesting complete. Exiting...")
 
 if __name__ == "__main__":
@@ -1,138 +1,712 @@
+import argparse
+import asyncio
 import socket
 from concurrent.futures import ThreadPoolExecutor
 from file_protocol import FileProtocol
-import base64
+from file_storage import make_storage
+from file_compression import CompressedStore, Decompressor, DecoderChain
+from file_async_server import serve as serve_asyncio
+from file_metrics import Metrics, MeteredSocket, serve_http
+from file_cluster import Cluster, WRITE_COMMANDS
+from file_request import Request
+from file_transcode import Transcoder
+from file_framing import (MAGIC, TERMINATOR, TEXT_STREAM_END, ReadBuffer, SocketReader, read_request, read_response,
+                          pack_request, pack_response, text_response, text_stream_prefix, send_buffers)
 import os
 import multiprocessing
+import multiprocessing.connection
+import signal
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SERVER_PORT = int(os.getenv("port_server", "6666"))
+CHUNK_SIZE = int(os.getenv("chunk_size", str(1024 * 1024)))
+# koneksi persistent ditutup jika tidak ada request selama IDLE_TIMEOUT detik (0 = satu request per koneksi)
+IDLE_TIMEOUT = float(os.getenv("idle_timeout", "30"))
+WORKER_THREADS = int(os.getenv("worker_threads", "8"))
+# port endpoint HTTP /metrics (format Prometheus) di 127.0.0.1; 0 = tidak dijalankan
+METRICS_PORT = int(os.getenv("metrics_port", "0"))
+# proses untuk encode/decode base64 besar di luar GIL (mode thread/asyncio); 0 = dikerjakan di thread
+TRANSCODE_WORKERS = int(os.getenv("transcode_workers", str(os.cpu_count() or 1)))
+TRANSCODE_MIN_SIZE = int(os.getenv("transcode_min_size", str(256 * 1024)))
+
 class Server:
-    def __init__(self, ip='0.0.0.0', port=SERVER_PORT, max_workers=5, mode="thread"):
+    def __init__(self, ip='0.0.0.0', port=SERVER_PORT, max_workers=5, mode="thread", chunk_size=CHUNK_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 worker_threads=WORKER_THREADS, worker_mode="thread", metrics_port=METRICS_PORT, node=None,
+                 transcode_workers=TRANSCODE_WORKERS):
         self.ip = ip
         self.port = port
         self.mode = mode
         self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.idle_timeout = idle_timeout
+        # mode process: tiap proses worker punya thread pool / event loop sendiri
+        self.worker_threads = worker_threads
+        self.worker_mode = worker_mode
+        self.worker_id = None
         self.protocol = FileProtocol()
+        # cache konten dipakai bersama dengan FileInterface (satu budget byte per proses)
+        self.cache = self.protocol.file.cache
+        # penyimpanan file upload (plain atau dedup, dipilih lewat env storage)
+        self.storage = make_storage("uploads")
+        # salinan terkompresi untuk GET dengan encoding
+        self.compressed = CompressedStore(self.storage)
+        self.pool = None
+        # statistik di shared memory, satu slot per proses worker pada mode process
+        self.metrics = Metrics(max_workers if mode == "process" else 1)
+        self.metrics_port = metrics_port
+        # mode cluster (env cluster_nodes): file dibagi ke beberapa server lewat consistent hashing
+        self.cluster = Cluster.from_env(port, node)
+        # mode process sudah memakai semua core (dan proses worker daemon tidak boleh punya proses anak)
+        self.transcoder = Transcoder(transcode_workers if mode != "process" else 0, TRANSCODE_MIN_SIZE)
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.bind((self.ip, self.port))
-        self.sock.listen(100)
+        # dengan SO_REUSEPORT tiap proses worker membuka socket sendiri dan kernel yang membagi koneksi
+        self.reuse_port = mode == "process" and hasattr(socket, "SO_REUSEPORT")
+        self.sock = None if self.reuse_port else self._make_socket()
 
-        if mode == "thread":
+        if mode in ("thread", "asyncio"):
+            # mode asyncio memakai pool ini sebagai executor untuk disk I/O dan base64
             self.pool = ThreadPoolExecutor(max_workers=max_workers)
 
+    def _make_socket(self, reuse_port=False):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.ip, self.port))
+        sock.listen(100)
+        return sock
+
     def handle_client(self, conn, addr):
+        self.metrics.add("queued", -1)
+        self.metrics.add("connections_total")
+        self.metrics.add("connections_active")
+        conn = MeteredSocket(conn, self.metrics)
         try:
-            buffer = b""
-            while True:
-                data = conn.recv(1024 * 1024)
-                if not data:
+            # header response dan isi file dikirim terpisah (sendall lalu sendfile); tanpa TCP_NODELAY
+            # Nagle menahan isi file kecil sampai header di-ACK sehingga GET kecil tertunda ~40ms
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.idle_timeout:
+                conn.settimeout(self.idle_timeout)
+            reader = SocketReader(conn, b"", self.chunk_size)
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = reader.peek(len(MAGIC))
+                except socket.timeout:
                     break
-                buffer += data
-                if b"\r\n\r\n" in buffer:
+                if not head:
                     break
 
-            command_str = buffer.decode(errors="ignore").strip()
-            print(f"[SERVER] Received {len(buffer)} bytes from {addr}")
-
-            if command_str.startswith("UPLOAD"):
+                conn.begin()
                 try:
-                    parts = command_str.split(" ", 2)
-                    if len(parts) != 3:
-                        raise ValueError("Invalid UPLOAD format")
-                    _, filename, encoded = parts
-                    filedata = base64.b64decode(encoded)
-                    os.makedirs("uploads", exist_ok=True)
-                    filepath = os.path.join("uploads", filename)
-                    with open(filepath, "wb") as f:
-                        f.write(filedata)
-                    response = {"status": "OK", "data": f"File {filename} uploaded successfully"}
-                except Exception as e:
-                    print(f"[SERVER] Upload error: {e}")
-                    response = {"status": "ERROR", "data": f"Upload failed: {str(e)}"}
-
-            elif command_str.startswith("GET"):
-                try:
-                    parts = command_str.split(" ", 1)
-                    if len(parts) != 2:
-                        raise ValueError("Invalid GET format")
-                    _, filename = parts
-                    filepath = os.path.join("uploads", filename)
-                    if not os.path.exists(filepath):
-                        raise FileNotFoundError(f"{filename} not found")
-
-                    with open(filepath, "rb") as f:
-                        filedata = f.read()
-                        encoded = base64.b64encode(filedata).decode()
-                    response = {"status": "OK", "data_file": encoded}
-                except Exception as e:
-                    print(f"[SERVER] Download error: {e}")
-                    response = {"status": "ERROR", "data": f"Download failed: {str(e)}"}
-
-            else:
-                try:
-                    result = self.protocol.proses_string(command_str)
-                    if isinstance(result, dict):
-                        response = result
+                    if head == MAGIC:
+                        keep_alive = self.handle_binary(conn, addr, reader)
                     else:
-                        response = {"status": "OK", "data": result}
-                except Exception as e:
-                    response = {"status": "ERROR", "data": f"Command error: {str(e)}"}
-
-            conn.sendall((str(response).replace("'", '"') + "\r\n\r\n").encode())
+                        keep_alive = self.handle_text(conn, addr, reader)
+                finally:
+                    conn.end()
+                keep_alive = keep_alive and bool(self.idle_timeout)
         except Exception as e:
             print(f"[SERVER] General error with {addr}: {e}")
         finally:
             conn.close()
+            self.metrics.add("connections_active", -1)
+
+    def handle_binary(self, conn, addr, reader):
+        command_str, payload_len = read_request(reader)
+        request = Request.parse(command_str)
+        print(f"[SERVER] Binary request {request.command} ({payload_len} bytes payload) from {addr}")
+        conn.command = request.command
+
+        node = self._route(request)
+        if node is not None:
+            body = reader.iter_exact(payload_len)
+            if self.cluster.misroute == "forward":
+                self._forward(conn, node, pack_request(command_str, payload_len), body, binary=True)
+            else:
+                self._drain(body)
+                conn.sendall(pack_response(self._redirect(node, request)))
+            return True
+
+        if request.command in ("UPLOAD", "UPLOADAT"):
+            body = reader.iter_exact(payload_len)
+            try:
+                filename, offset = self._upload_target(request)
+                upload = self._write_upload(filename, body, offset, encoding=request.encoding, expected=request.checksum)
+                response = self._finish_upload(request, filename, offset, upload)
+            except Exception as e:
+                print(f"[SERVER] Upload error: {e}")
+                self._drain(body)
+                response = {"status": "ERROR", "data": f"Upload failed: {str(e)}"}
+
+        elif request.command == "GET":
+            try:
+                meta, _, f, offset, length = self._prepare_get(request)
+            except Exception as e:
+                print(f"[SERVER] Download error: {e}")
+                response = {"status": "ERROR", "data": f"Download failed: {str(e)}"}
+            else:
+                with f:
+                    conn.sendall(pack_response(self._tag(meta, request.request_id), length))
+                    # zero-copy: isi file dikirim kernel lewat sendfile(2), tanpa lewat buffer Python
+                    if length:
+                        conn.sendfile(f, offset, length)
+                return True
+
+        elif request.command == "CLOSE":
+            conn.sendall(pack_response(self._tag({"status": "OK", "data": "connection closed"}, request.request_id)))
+            return False
+
+        else:
+            response = self._run_command(request)
+
+        conn.sendall(pack_response(self._tag(response, request.request_id)))
+        return True
+
+    def handle_text(self, conn, addr, reader):
+        request_id = None
+        if reader.peek(1) == b"#":
+            request_id = reader.read_token()[1:].decode(errors="ignore")
+
+        if reader.peek(len("UPLOAD")) == b"UPLOAD":
+            request = Request(" ".join(reader.read_upload_header()), request_id)
+            conn.command = request.command
+            raw = reader.iter_until(TERMINATOR)
+            node = self._route(request)
+            if node is not None:
+                if self.cluster.misroute == "forward":
+                    self._forward(conn, node, (request.raw + " ").encode(), raw)
+                else:
+                    self._drain(raw)
+                    conn.sendall(text_response(self._redirect(node, request)))
+                return True
+            try:
+                filename, offset = self._upload_target(request)
+                upload = self._write_upload(filename, raw, offset, self.transcoder.decoder(), request.encoding,
+                                            request.checksum)
+                response = self._finish_upload(request, filename, offset, upload)
+            except Exception as e:
+                print(f"[SERVER] Upload error: {e}")
+                self._drain(raw)
+                response = {"status": "ERROR", "data": f"Upload failed: {str(e)}"}
+            print(f"[SERVER] Received {request.command} {request.filename} from {addr}")
+            conn.sendall(text_response(self._tag(response, request_id)))
+            return True
+
+        request = Request(reader.read_until(TERMINATOR).decode(errors="ignore"), request_id)
+        print(f"[SERVER] Received {len(request.command_str)} bytes from {addr}")
+        conn.command = request.command
+
+        node = self._route(request)
+        if node is not None:
+            if self.cluster.misroute == "forward":
+                self._forward(conn, node, request.raw.encode(), ())
+            else:
+                conn.sendall(text_response(self._redirect(node, request)))
+            return True
+
+        if request.command == "GET":
+            try:
+                meta, encoded, f, offset, length = self._prepare_get(request, cached=True)
+            except Exception as e:
+                print(f"[SERVER] Download error: {e}")
+                response = {"status": "ERROR", "data": f"Download failed: {str(e)}"}
+            else:
+                prefix = self._text_stream_prefix(request_id, meta)
+                if encoded is not None:
+                    # header, isi base64 dari cache dan penutup dikirim sebagai buffer terpisah dalam satu sendmsg
+                    send_buffers(conn, [prefix, encoded, TEXT_STREAM_END])
+                else:
+                    # kirim JSON bertahap per potongan base64 (file di luar cache atau GET sebagian)
+                    conn.sendall(prefix)
+                    step = self.chunk_size - self.chunk_size % 3 or 3
+                    with f:
+                        remaining = length
+                        while remaining > 0:
+                            with self.metrics.phase("disk"):
+                                chunk = f.read(min(step, remaining))
+                            if not chunk:
+                                break
+                            remaining -= len(chunk)
+                            with self.metrics.phase("decode"):
+                                chunk = self.transcoder.encode(chunk)
+                            conn.sendall(chunk)
+                    conn.sendall(TEXT_STREAM_END)
+                return True
+
+        elif request.command == "CLOSE":
+            conn.sendall(text_response(self._tag({"status": "OK", "data": "connection closed"}, request_id)))
+            return False
+
+        else:
+            response = self._run_command(request)
+
+        conn.sendall(text_response(self._tag(response, request_id)))
+        return True
+
+    def _run_command(self, request):
+        # perintah selain UPLOAD/GET/CLOSE, sama untuk kedua framing; mode asyncio menjalankannya di executor
+        if request.command == "BATCH":
+            return self.protocol.batch(request.command_str[len("BATCH "):], self._batch_item)
+        try:
+            response = self._local_command(request.command, request.args)
+            if response is None:
+                response = self.protocol.proses_request(" ".join(request.parts) if request.replica else request.command_str)
+            if response.get("status") == "OK" and not request.replica:
+                self._replicate(request.command, request.args)
+        except Exception as e:
+            response = {"status": "ERROR", "data": f"Command error: {str(e)}"}
+        return response
+
+    def _batch_item(self, command_str):
+        # satu perintah di dalam BATCH dilayani atas storage server ini seperti request tersendiri;
+        # UPLOAD membawa isi base64 di perintahnya, GET mengembalikan data_file
+        if command_str[:6].upper() == "UPLOAD":
+            buf = ReadBuffer(command_str.encode())
+            request = Request(" ".join(buf.take_upload_header(eof=True)))
+        else:
+            request = Request(command_str)
+        node = self._route(request)
+        if node is not None:
+            return self._redirect(node, request)
+        if request.command in ("UPLOAD", "UPLOADAT"):
+            try:
+                filename, offset = self._upload_target(request)
+                upload = self._write_upload(filename, [bytes(buf.buffer)], offset, self.transcoder.decoder(),
+                                            request.encoding, request.checksum)
+                return self._finish_upload(request, filename, offset, upload)
+            except Exception as e:
+                return {"status": "ERROR", "data": f"Upload failed: {str(e)}"}
+        if request.command == "GET":
+            try:
+                meta, encoded, f, offset, length = self._prepare_get(request, cached=True)
+                if encoded is None:
+                    with f:
+                        encoded = self.transcoder.encode(f.read(length))
+            except Exception as e:
+                return {"status": "ERROR", "data": f"Download failed: {str(e)}"}
+            meta["data_file"] = encoded.decode()
+            return meta
+        return self._run_command(request)
+
+    def _local_command(self, command, args):
+        # perintah yang dilayani langsung oleh server atas direktori uploads; None = teruskan ke FileProtocol
+        if command == "STATS":
+            return {"status": "OK", "data": self.metrics.snapshot()}
+        if command == "CLUSTER":
+            if self.cluster is None:
+                return {"status": "ERROR", "data": "server tidak berjalan dalam mode cluster"}
+            hasil = {"status": "OK", "data": self.cluster.ring.nodes, "node": self.cluster.node,
+                     "replicas": self.cluster.replicas}
+            if args:
+                hasil["placement"] = self.cluster.placement(args[0])
+            return hasil
+        if command == "REBALANCE":
+            if self.cluster is None:
+                return {"status": "ERROR", "data": "server tidak berjalan dalam mode cluster"}
+            return self._rebalance()
+        if command == "SIZE":
+            if len(args) != 1:
+                raise ValueError("Invalid SIZE format")
+            filepath = self.storage.path(args[0])
+            if not os.path.exists(filepath):
+                return {"status": "ERROR", "data": f"{args[0]} not found"}
+            return {"status": "OK", "data_namafile": args[0], "size": os.path.getsize(filepath)}
+        if command == "STAT":
+            if len(args) != 1:
+                raise ValueError("Invalid STAT format")
+            try:
+                st = os.stat(self.storage.path(args[0]))
+            except FileNotFoundError:
+                return {"status": "ERROR", "data": f"{args[0]} not found"}
+            digest = self.storage.checksum(args[0], st) or self.storage.compute_checksum(args[0])
+            return {"status": "OK", "data_namafile": args[0], "size": st.st_size, "mtime": st.st_mtime, "sha256": digest}
+        if command == "ALLOCATE":
+            if len(args) != 2:
+                raise ValueError("Invalid ALLOCATE format")
+            size = int(args[1])
+            self.storage.allocate(args[0], size)
+            self.cache.invalidate(self.storage.path(args[0]))
+            return {"status": "OK", "data": f"File {args[0]} allocated", "size": size}
+        if command == "HAVE":
+            if len(args) != 1:
+                raise ValueError("Invalid HAVE format")
+            if not self.storage.have(args[0].lower()):
+                return {"status": "ERROR", "data": f"{args[0]} not found"}
+            return {"status": "OK", "data": args[0].lower()}
+        if command == "LINK":
+            if len(args) != 2:
+                raise ValueError("Invalid LINK format")
+            try:
+                size = self.storage.link(args[0], args[1].lower())
+            except FileNotFoundError:
+                return {"status": "ERROR", "data": f"{args[1]} not found"}
+            self.cache.invalidate(self.storage.path(args[0]))
+            return {"status": "OK", "data": f"File {args[0]} uploaded successfully", "size": size}
+        if command == "DELETE":
+            if len(args) != 1:
+                raise ValueError("Invalid DELETE format")
+            try:
+                self.storage.delete(args[0])
+            except FileNotFoundError:
+                return {"status": "ERROR", "data": f"{args[0]} not found"}
+            self.cache.invalidate(self.storage.path(args[0]))
+            self.compressed.discard(args[0])
+            return {"status": "OK", "data": f"File {args[0]} deleted successfully"}
+        return None
+
+    def _route(self, request):
+        # node tujuan jika file pada request ini bukan milik node ini; None = dilayani di sini
+        if self.cluster is None or request.filename is None:
+            return None
+        return self.cluster.route(request.command, request.filename, request.replica)
+
+    def _redirect(self, node, request):
+        response = {"status": "REDIRECT", "data": node, "nodes": self.cluster.placement(request.filename)}
+        return self._tag(response, request.request_id)
+
+    def _forward(self, conn, node, head, body, binary=False):
+        # proxy ke node pemilik: request dialirkan apa adanya lalu response-nya dialirkan balik ke client.
+        # koneksi baru per request karena body client tidak bisa diulang jika koneksi pool ternyata basi
+        upstream = self.cluster.connect(node)
+        try:
+            upstream.sendall(head)
+            for chunk in body:
+                upstream.sendall(chunk)
+            reader = SocketReader(upstream, b"", self.chunk_size)
+            if binary:
+                meta, length = read_response(reader)
+                conn.sendall(pack_response(meta, length))
+                for chunk in reader.iter_exact(length):
+                    conn.sendall(chunk)
+            else:
+                upstream.sendall(TERMINATOR)
+                for chunk in reader.iter_until(TERMINATOR):
+                    conn.sendall(chunk)
+                conn.sendall(TERMINATOR)
+        finally:
+            upstream.close()
+
+    def _replicate(self, command, args, upload=None):
+        # node primer menyalin tulisan ke replika sebelum menjawab client: UPLOAD/LINK dikirim utuh,
+        # UPLOADAT hanya rentang yang baru ditulis, ALLOCATE/DELETE cukup perintahnya
+        if self.cluster is None or command not in WRITE_COMMANDS or not args:
+            return
+        filename = args[0]
+        for node in self.cluster.replicas_for(filename):
+            try:
+                if command in ("UPLOAD", "LINK"):
+                    meta = self.cluster.send_file(node, f"UPLOAD {filename} replica", self.storage.path(filename))
+                elif command == "UPLOADAT":
+                    meta = self.cluster.send_file(node, f"UPLOADAT {filename} {upload.start} replica", upload.filepath,
+                                                  upload.start, upload.end - upload.start)
+                else:
+                    meta = self.cluster.command(node, " ".join([command] + args + ["replica"]))
+                if meta.get("status") != "OK":
+                    raise IOError(meta.get("data"))
+            except Exception as e:
+                print(f"[CLUSTER] Replication {command} {filename} to {node} failed: {e}")
+
+    def _rebalance(self):
+        # dijalankan di tiap node lama setelah node baru ditambahkan ke cluster_nodes: hanya file yang
+        # penempatannya tidak lagi mencakup node ini yang dikirim ke pemilik barunya lalu dihapus di sini
+        moved, kept, failed = [], 0, []
+        with os.scandir(self.storage.root) as entries:
+            names = [e.name for e in entries if e.is_file() and not e.name.startswith(".")]
+        for filename in names:
+            nodes = self.cluster.placement(filename)
+            if self.cluster.node in nodes:
+                kept += 1
+                continue
+            try:
+                for node in nodes:
+                    meta = self.cluster.send_file(node, f"UPLOAD {filename} replica", self.storage.path(filename))
+                    if meta.get("status") != "OK":
+                        raise IOError(meta.get("data"))
+                self.storage.delete(filename)
+                self.cache.invalidate(self.storage.path(filename))
+                moved.append(filename)
+            except Exception as e:
+                print(f"[CLUSTER] Rebalance {filename} failed: {e}")
+                failed.append(filename)
+        return {"status": "OK" if not failed else "ERROR", "data": f"{len(moved)} file dipindahkan",
+                "moved": moved, "kept": kept, "failed": failed}
+
+    def _tag(self, response, request_id):
+        if request_id is not None:
+            response["id"] = request_id
+        return response
+
+    def _text_stream_prefix(self, request_id, meta):
+        # awal JSON response GET teks; data_file diisi bertahap setelahnya
+        return text_stream_prefix(self._tag(meta, request_id))
+
+    def _download_meta(self, filename, parts, size=None, offset=None, codec=None):
+        meta = {"status": "OK", "data_namafile": filename}
+        if len(parts) > 2:
+            meta.update(offset=offset, size=size)
+        else:
+            # digest yang tersimpan saat upload (tanpa membaca ulang file); tidak ada jika belum diketahui
+            digest = self.storage.checksum(filename)
+            if digest is not None:
+                meta["sha256"] = digest
+        if codec is not None:
+            meta["encoding"] = codec
+        return meta
+
+    def _negotiate(self, filename, parts, encoding):
+        # GET utuh dengan encoding: kirim salinan terkompresi jika isinya layak dikompresi
+        if not encoding or len(parts) != 2:
+            return None, None
+        codec = self.compressed.negotiate(filename, encoding)
+        if codec is None:
+            return None, None
+        return codec, self.compressed.compressed_path(filename, codec)
+
+    def _upload_target(self, request):
+        command, args = request.command, request.args
+        if command == "UPLOAD" and len(args) == 1:
+            return args[0], None
+        if command == "UPLOADAT" and len(args) == 2:
+            offset = args[1].lower()
+            return args[0], offset if offset == "end" else int(offset)
+        raise ValueError(f"Invalid {command} format")
+
+    def _upload_response(self, filename, offset, upload):
+        # sha256: digest data yang diterima dan ditulis (UPLOAD: seluruh isi file, UPLOADAT: rentang yang ditulis)
+        response = {"status": "OK", "data": f"File {filename} uploaded successfully", "sha256": upload.digest}
+        if offset is not None:
+            response["size"] = upload.size
+        return response
+
+    def _finish_upload(self, request, filename, offset, upload):
+        # upload sudah tersimpan: node primer menyalinnya ke replika lalu response disusun
+        if not request.replica:
+            self._replicate(request.command, [filename], upload)
+        return self._upload_response(filename, offset, upload)
+
+    def _write_upload(self, filename, chunks, offset=None, decoder=None, encoding=(), expected=None):
+        upload = self.storage.open_upload(filename, offset)
+        sidecar = None
+        try:
+            decoder, sidecar = self._upload_decoder(decoder, encoding, offset)
+            for chunk in chunks:
+                self._write_chunk(upload, chunk, decoder)
+            if decoder is not None:
+                self._write_chunk(upload, None, decoder)
+            self._verify(upload, expected)
+            with self.metrics.phase("disk"):
+                upload.commit()
+        except Exception:
+            upload.abort()
+            self._discard_sidecar(sidecar)
+            raise
+        finally:
+            self.cache.invalidate(upload.filepath)
+        self._install_sidecar(filename, encoding, sidecar, upload)
+        return upload
+
+    def _verify(self, upload, expected):
+        # dibandingkan sebelum commit sehingga data yang rusak/terpotong tidak pernah menggantikan file lama
+        if expected is not None and upload.hash.hexdigest() != expected:
+            raise ValueError("checksum sha256 tidak cocok, data rusak atau terpotong")
+
+    def _write_chunk(self, upload, chunk, decoder):
+        # chunk None = akhir data, sisa isi decoder ditulis
+        if decoder is not None:
+            with self.metrics.phase("decode"):
+                chunk = decoder.feed(chunk) if chunk is not None else decoder.flush()
+        with self.metrics.phase("disk"):
+            upload.write(chunk)
+
+    def _upload_decoder(self, decoder, encoding, offset):
+        # upload terkompresi didekompresi sambil ditulis; upload utuh sekaligus menyimpan data terkompresinya
+        # sebagai salinan sehingga GET terkompresi berikutnya tidak perlu mengompresi ulang
+        if not encoding:
+            return decoder, None
+        if len(encoding) != 1:
+            raise ValueError("UPLOAD membutuhkan tepat satu encoding")
+        decompressor = Decompressor(encoding[0])
+        sidecar = None
+        if offset is None:
+            sidecar = self.compressed.open_sidecar()
+            decompressor.sidecar = sidecar[0]
+        return (DecoderChain(decoder, decompressor) if decoder is not None else decompressor), sidecar
+
+    def _install_sidecar(self, filename, encoding, sidecar, upload):
+        if sidecar is not None:
+            self.compressed.install(filename, encoding[0], sidecar[0], sidecar[1], upload.stat)
+
+    def _discard_sidecar(self, sidecar):
+        if sidecar is not None:
+            self.compressed.abandon(*sidecar)
+
+    def _open_download(self, filename, filepath=None):
+        filepath = filepath or self.storage.path(filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"{filename} not found")
+        return open(filepath, "rb")
+
+    def _open_range(self, filename, args, filepath=None):
+        f = self._open_download(filename, filepath)
+        try:
+            size = os.fstat(f.fileno()).st_size
+            offset = int(args[0]) if args else 0
+            length = int(args[1]) if len(args) > 1 else size - offset
+            if offset < 0 or length < 0 or offset > size:
+                raise ValueError(f"Invalid range {offset}+{length} for size {size}")
+            f.seek(offset)
+            return f, size, offset, min(length, size - offset)
+        except Exception:
+            f.close()
+            raise
+
+    def _prepare_get(self, request, cached=False):
+        # (meta, isi base64 dari cache atau None, file, offset, panjang) untuk GET; cached hanya untuk GET teks utuh
+        parts = request.parts
+        if not 2 <= len(parts) <= 4:
+            raise ValueError("Invalid GET format")
+        filename = parts[1]
+        codec, filepath = self._negotiate(filename, parts, request.encoding)
+        if cached and len(parts) == 2:
+            encoded = self._cached_download(filename, filepath)
+            if encoded is not None:
+                return self._download_meta(filename, parts, codec=codec), encoded, None, 0, 0
+        f, size, offset, length = self._open_range(filename, parts[2:], filepath)
+        try:
+            return self._download_meta(filename, parts, size, offset, codec), None, f, offset, length
+        except Exception:
+            f.close()
+            raise
+
+    def _cached_download(self, filename, filepath=None):
+        # isi file dalam base64 dari cache; None jika terlalu besar untuk budget cache
+        filepath = filepath or self.storage.path(filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"{filename} not found")
+        key = self.cache.key_for(filepath, "base64")
+        if not self.cache.fits(key[2] * 4 // 3 + 4):
+            return None
+        return self.cache.get_or_load(key, lambda: self._read_base64(filepath))
+
+    def _read_base64(self, filepath):
+        with self.metrics.phase("disk"), open(filepath, "rb") as f:
+            data = f.read()
+        with self.metrics.phase("decode"):
+            return self.transcoder.encode(data)
+
+    def _drain(self, chunks):
+        try:
+            for _ in chunks:
+                pass
+        except Exception:
+            pass
 
     def serve_forever(self):
         print(f"[SERVER-{self.mode.upper()}] Listening on port {self.port} with PID {os.getpid()}...")
         while True:
             conn, addr = self.sock.accept()
-            if self.mode == "thread":
-                self.pool.submit(self.handle_client, conn, addr)
-            elif self.mode == "process":
-                # langsung handle di proses ini
-                self.handle_client(conn, addr)
+            self.metrics.add("queued")
+            self.pool.submit(self.handle_client, conn, addr)
+
+    def _worker_main(self, worker_id):
+        self.worker_id = worker_id
+        self.metrics.use_slot(worker_id)
+        if self.reuse_port:
+            self.sock = self._make_socket(reuse_port=True)
+        self.pool = ThreadPoolExecutor(max_workers=self.worker_threads)
+        print(f"[WORKER {worker_id + 1}/{self.max_workers}] PID {os.getpid()}, {self.worker_mode} with {self.worker_threads} threads")
+        if self.worker_mode == "asyncio":
+            asyncio.run(serve_asyncio(self))
+        else:
+            self.serve_forever()
+
+    def _spawn_worker(self, worker_id):
+        p = multiprocessing.Process(target=self._worker_main, args=(worker_id,), daemon=True)
+        p.start()
+        return p
+
+    def supervise(self):
+        if threading.current_thread() is threading.main_thread():
+            # SIGTERM ke supervisor ikut menghentikan semua worker lewat blok finally
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        workers = {worker_id: self._spawn_worker(worker_id) for worker_id in range(self.max_workers)}
+        started = {worker_id: time.monotonic() for worker_id in workers}
+        try:
+            while True:
+                multiprocessing.connection.wait([p.sentinel for p in workers.values()])
+                for worker_id, p in list(workers.items()):
+                    if p.is_alive():
+                        continue
+                    print(f"[SUPERVISOR] Worker {worker_id + 1} (PID {p.pid}) exited with code {p.exitcode}, restarting...")
+                    # hindari restart beruntun jika worker langsung gagal (misal port tidak bisa di-bind)
+                    if time.monotonic() - started[worker_id] < 1:
+                        time.sleep(1)
+                    workers[worker_id] = self._spawn_worker(worker_id)
+                    started[worker_id] = time.monotonic()
+        finally:
+            for p in workers.values():
+                p.terminate()
 
     def run(self):
+        if self.metrics_port:
+            serve_http(self.metrics, self.metrics_port)
+            print(f"[SERVER] Metrics at http://127.0.0.1:{self.metrics_port}/metrics")
         if self.mode == "thread":
             print(f"[SERVER] Running in THREAD mode with {self.max_workers} workers...")
             self.serve_forever()
         elif self.mode == "process":
-            print(f"[SERVER] Running in PROCESS mode with {self.max_workers} processes...")
-            processes = []
-            for _ in range(self.max_workers):
-                p = multiprocessing.Process(target=self.serve_forever)
-                p.start()
-                processes.append(p)
+            balancing = "SO_REUSEPORT" if self.reuse_port else "shared socket"
+            print(f"[SERVER] Running in PROCESS mode with {self.max_workers} processes ({balancing})...")
+            self.supervise()
+        elif self.mode == "asyncio":
+            print(f"[SERVER] Running in ASYNCIO mode with {self.max_workers} executor workers...")
+            asyncio.run(serve_asyncio(self))
 
-            for p in processes:
-                p.join()
+def parse_args():
+    parser = argparse.ArgumentParser(description="File server untuk stress test")
+    parser.add_argument("--mode", choices=["thread", "process", "asyncio"], help="metode eksekusi")
+    parser.add_argument("--workers", type=int, help="jumlah worker (thread/proses/executor)")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--worker-threads", type=int, default=WORKER_THREADS, help="thread per proses worker (mode process)")
+    parser.add_argument("--worker-mode", choices=["thread", "asyncio"], default="thread", help="model eksekusi di dalam proses worker")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="port endpoint HTTP /metrics (0 = mati)")
+    parser.add_argument("--transcode-workers", type=int, default=TRANSCODE_WORKERS,
+                        help="proses untuk base64 besar (0 = di thread; mode process selalu 0)")
+    parser.add_argument("--node", help="alamat host:port node ini di cluster_nodes (default: dicocokkan dari --port)")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     print("==== FILE SERVER CONFIGURATION ====")
-    print("Pilih metode eksekusi:")
-    print("1. Multithreading")
-    print("2. Multiprocessing")
-
-    mode_input = input("Pilihan [1/2]: ").strip()
-    mode = "thread" if mode_input != "2" else "process"
-
-    print("\nPilih jumlah worker:")
-    print("1. 1")
-    print("2. 5")
-    print("3. 50")
-    worker_input = input("Pilihan [1/2/3]: ").strip()
-    worker_map = {"1": 1, "2": 5, "3": 50}
-    workers = worker_map.get(worker_input, 5)
-
-    port = SERVER_PORT
-    server = Server(port=port, max_workers=workers, mode=mode)
+    mode = args.mode
+    if mode is None:
+        print("Pilih metode eksekusi:")
+        print("1. Multithreading")
+        print("2. Multiprocessing")
+        print("3. Asyncio")
+
+        mode_input = input("Pilihan [1/2/3]: ").strip()
+        mode = {"2": "process", "3": "asyncio"}.get(mode_input, "thread")
+
+    workers = args.workers
+    if workers is None:
+        print("\nPilih jumlah worker:")
+        print("1. 1")
+        print("2. 5")
+        print("3. 50")
+        worker_input = input("Pilihan [1/2/3]: ").strip()
+        worker_map = {"1": 1, "2": 5, "3": 50}
+        workers = worker_map.get(worker_input, 5)
+
+    server = Server(port=args.port, max_workers=workers, mode=mode,
+                    worker_threads=args.worker_threads, worker_mode=args.worker_mode, metrics_port=args.metrics_port,
+                    node=args.node, transcode_workers=args.transcode_workers)
     server.run()
 
 if __name__ == '__main__':
@@ -0,0 +1,153 @@
+import binascii
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from file_framing import Base64Decoder
+
+# ukuran potongan per tugas worker; kelipatan 12 sehingga batas potongan selaras untuk encode (3 byte)
+# maupun decode (4 karakter) dan tiap potongan bisa ditulis langsung ke posisinya di segmen output
+SHARD_SIZE = 12 * 128 * 1024
+# upload base64 dikumpulkan sebanyak ini sebelum didekode paralel
+DECODE_BATCH = 4 * SHARD_SIZE
+
+
+def _attach(name):
+    # worker (spawn) memakai resource_tracker yang sama dengan server, jadi segmen cukup di-unlink oleh
+    # server yang membuatnya; worker hanya membuka dan menutupnya
+    return shared_memory.SharedMemory(name=name)
+
+
+def _watch_parent(ppid):
+    # antrean tugas ProcessPoolExecutor ikut dipegang worker sehingga worker tidak pernah melihat EOF;
+    # worker berhenti sendiri jika server mati tanpa sempat mematikan pool (SIGTERM/SIGKILL)
+    def watch():
+        while os.getppid() == ppid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def _encode_shard(src_name, dst_name, start, end):
+    src, dst = _attach(src_name), _attach(dst_name)
+    try:
+        with src.buf[start:end] as view:
+            out = binascii.b2a_base64(view, newline=False)
+        pos = start // 3 * 4
+        dst.buf[pos:pos + len(out)] = out
+        return len(out)
+    finally:
+        src.close()
+        dst.close()
+
+
+def _decode_shard(src_name, dst_name, start, end):
+    src, dst = _attach(src_name), _attach(dst_name)
+    try:
+        with src.buf[start:end] as view:
+            out = binascii.a2b_base64(view)
+        pos = start // 4 * 3
+        dst.buf[pos:pos + len(out)] = out
+        return len(out)
+    finally:
+        src.close()
+        dst.close()
+
+
+class Transcoder:
+    # base64 besar dikerjakan paralel di ProcessPoolExecutor (lepas dari GIL): input disalin sekali ke
+    # shared memory, worker menulis hasil tiap potongan ke segmen output. workers 0 atau data di bawah
+    # min_size dikerjakan langsung di thread pemanggil seperti sebelumnya
+    def __init__(self, workers=0, min_size=256 * 1024):
+        self.workers = workers
+        self.min_size = min_size
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        with self.lock:
+            if self.pool is None:
+                # spawn: fork dari server yang sudah punya banyak thread tidak aman
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"),
+                                                initializer=_watch_parent, initargs=(os.getpid(),))
+            return self.pool
+
+    def offloads(self, size):
+        return self.workers > 0 and size >= self.min_size
+
+    def encode(self, data):
+        if not self.offloads(len(data)):
+            return binascii.b2a_base64(data, newline=False)
+        src = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            src.buf[:len(data)] = data
+            return self._run(_encode_shard, src, len(data), (len(data) + 2) // 3 * 4, SHARD_SIZE // 3 * 4)
+        finally:
+            src.close()
+            src.unlink()
+
+    def decode(self, data):
+        # data base64 tanpa whitespace dengan panjang kelipatan 4
+        if not self.offloads(len(data)):
+            return binascii.a2b_base64(data)
+        src = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            src.buf[:len(data)] = data
+            return self._run(_decode_shard, src, len(data), len(data) // 4 * 3, SHARD_SIZE // 4 * 3)
+        finally:
+            src.close()
+            src.unlink()
+
+    def decoder(self):
+        return ShardedBase64Decoder(self) if self.workers > 0 else Base64Decoder()
+
+    def _run(self, job, src, size, out_size, full):
+        dst = shared_memory.SharedMemory(create=True, size=max(out_size, 1))
+        try:
+            shards = [(start, min(start + SHARD_SIZE, size)) for start in range(0, size, SHARD_SIZE)]
+            futures = [self._executor().submit(job, src.name, dst.name, start, end) for start, end in shards]
+            written = [future.result() for future in futures]
+            # semua potongan kecuali yang terakhir harus menghasilkan ukuran penuh `full` (decode: tanpa
+            # padding atau karakter asing di tengah), kalau tidak posisi potongan berikutnya salah
+            if any(n != full for n in written[:-1]):
+                raise ValueError("data base64 tidak valid")
+            total = sum(written)
+            with dst.buf[:total] as view:
+                return bytes(view)
+        finally:
+            dst.close()
+            dst.unlink()
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+
+class ShardedBase64Decoder(Base64Decoder):
+    # sama seperti Base64Decoder, tetapi input dikumpulkan sampai DECODE_BATCH lalu didekode paralel
+    def __init__(self, transcoder):
+        Base64Decoder.__init__(self)
+        self.transcoder = transcoder
+        self.parts = []
+        self.buffered = 0
+
+    def feed(self, chunk):
+        chunk = chunk.translate(None, b" \t\r\n")
+        self.parts.append(chunk)
+        self.buffered += len(chunk)
+        if self.buffered < DECODE_BATCH:
+            return b""
+        data = self.pending + b"".join(self.parts)
+        self.parts, self.buffered = [], 0
+        aligned = len(data) - len(data) % 4
+        self.pending = data[aligned:]
+        return self.transcoder.decode(data[:aligned])
+
+    def flush(self):
+        data = self.pending + b"".join(self.parts)
+        self.pending, self.parts, self.buffered = b"", [], 0
+        return self.transcoder.decode(data) if data else b""
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # FileInterface dan server memakai direktori kerja (os.chdir("files/")), jadi tiap test di direktori sementara
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,87 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from file_cluster import Cluster
+from file_framing import SocketReader, pack_request, read_response
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(node, command_str, payload=b""):
+    host, _, port = node.rpartition(":")
+    with socket.create_connection((host, int(port)), timeout=10) as sock:
+        sock.sendall(pack_request(command_str, len(payload)) + payload)
+        reader = SocketReader(sock)
+        meta, payload_len = read_response(reader)
+        return meta, reader.read_exact(payload_len)
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    nodes = [f"127.0.0.1:{free_port()}" for _ in range(3)]
+    env = dict(os.environ, cluster_nodes=",".join(nodes), cluster_replicas="2")
+    procs = []
+    try:
+        for i, node in enumerate(nodes):
+            workdir = tmp_path / f"n{i}"
+            workdir.mkdir()
+            procs.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "file_stress_server.py"), "--mode", "thread", "--workers", "4",
+                 "--port", node.rpartition(":")[2], "--metrics-port", "0"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        for node in nodes:
+            wait_ready(node)
+        yield nodes, [tmp_path / f"n{i}" / "files" / "uploads" for i in range(3)]
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+def wait_ready(node, timeout=15):
+    host, _, port = node.rpartition(":")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, int(port)), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server {node} tidak siap")
+
+
+def test_delete_removes_file_on_every_replica(cluster):
+    nodes, dirs = cluster
+    placement = Cluster(nodes, replicas=2).placement("hapus.bin")
+    primary = placement[0]
+
+    meta, _ = request(primary, "UPLOAD hapus.bin", os.urandom(4096))
+    assert meta["status"] == "OK", meta
+    holders = [d for node, d in zip(nodes, dirs) if node in placement]
+    assert all((d / "hapus.bin").exists() for d in holders)
+
+    meta, _ = request(primary, "DELETE hapus.bin")
+    assert meta["status"] == "OK", meta
+    for d in dirs:
+        assert not (d / "hapus.bin").exists()
+    for node in placement:
+        meta, _ = request(node, "GET hapus.bin")
+        assert meta["status"] == "ERROR"
+
+
+def test_delete_missing_file(cluster):
+    nodes, _ = cluster
+    primary = Cluster(nodes, replicas=2).placement("tidak-ada.bin")[0]
+    meta, _ = request(primary, "DELETE tidak-ada.bin")
+    assert meta["status"] == "ERROR"
@@ -0,0 +1,53 @@
+import pytest
+
+from file_framing import ReadBuffer, pack_request
+from file_request import Request
+
+
+def test_upload_header_stops_at_payload():
+    buf = ReadBuffer(b"UPLOADAT a.txt 3 encoding=zlib sha256=ab Zm9v\r\n\r\n")
+    assert buf.take_upload_header() == ["UPLOADAT", "a.txt", "3", "encoding=zlib", "sha256=ab"]
+    assert bytes(buf.buffer) == b"Zm9v\r\n\r\n"
+
+
+def test_upload_header_waits_for_partial_option():
+    buf = ReadBuffer(b"UPLOAD a.txt sha2")
+    assert buf.take_upload_header() is None
+    buf.buffer += b"56=ab YWJj"
+    assert buf.take_upload_header() == ["UPLOAD", "a.txt", "sha256=ab"]
+
+
+def test_upload_header_short_payload():
+    # payload lebih pendek dari token opsional tidak boleh membuat parser menunggu data lagi
+    buf = ReadBuffer(b"UPLOAD a.txt YQ==\r\n\r\n")
+    assert buf.take_upload_header() == ["UPLOAD", "a.txt"]
+    assert buf.take_chunk_until() == (b"YQ==", True)
+
+
+def test_frame_split_across_reads():
+    data = pack_request("GET a.txt", 5)
+    buf = ReadBuffer(data[:10])
+    assert buf.take_frame() is None
+    buf.buffer += data[10:]
+    assert buf.take_frame() == (b"GET a.txt", 5)
+    with pytest.raises(ConnectionError):
+        ReadBuffer(data[:3]).take_frame(eof=True)
+
+
+def test_until_resumes_scan():
+    buf = ReadBuffer(b"LIST\r\n")
+    assert buf.take_until() is None
+    buf.buffer += b"\r\nGET"
+    assert buf.take_until() == b"LIST"
+    assert buf.take_until(eof=True) == b"GET"
+
+
+def test_request_splits_options():
+    request = Request.parse("#3 UPLOADAT a.txt end sha256=AB encoding=zlib replica")
+    assert request.request_id == "3"
+    assert request.command == "UPLOADAT"
+    assert request.args == ["a.txt", "end"]
+    assert request.checksum == "ab"
+    assert request.encoding == ["zlib"]
+    assert request.replica
+    assert request.raw == "#3 UPLOADAT a.txt end sha256=AB encoding=zlib replica"
@@ -0,0 +1,84 @@
+import base64
+import hashlib
+import zlib
+
+from file_protocol import FileProtocol
+
+
+def test_text_upload_with_checksum(workdir):
+    protocol = FileProtocol()
+    isi = b"hello" * 1000
+    digest = hashlib.sha256(isi).hexdigest()
+
+    hasil = protocol.proses_request(f"UPLOAD a.txt sha256={digest} {base64.b64encode(isi).decode()}")
+    assert hasil['status'] == 'OK', hasil
+    assert hasil['sha256'] == digest
+    assert (workdir / "files" / "a.txt").read_bytes() == isi
+
+
+def test_text_upload_checksum_mismatch_keeps_old_file(workdir):
+    protocol = FileProtocol()
+    isi = b"hello" * 1000
+    protocol.proses_request(f"UPLOAD a.txt {base64.b64encode(isi).decode()}")
+
+    salah = hashlib.sha256(b"lain").hexdigest()
+    hasil = protocol.proses_request(f"UPLOAD a.txt sha256={salah} {base64.b64encode(b'baru').decode()}")
+    assert hasil['status'] == 'ERROR'
+    assert (workdir / "files" / "a.txt").read_bytes() == isi
+
+
+def test_text_uploadat_with_checksum(workdir):
+    protocol = FileProtocol()
+    protocol.proses_request(f"UPLOAD a.txt {base64.b64encode(b'abcdef').decode()}")
+
+    digest = hashlib.sha256(b"XY").hexdigest()
+    hasil = protocol.proses_request(f"UPLOADAT a.txt 2 sha256={digest} {base64.b64encode(b'XY').decode()}")
+    assert hasil['status'] == 'OK', hasil
+    assert hasil['sha256'] == digest
+    assert (workdir / "files" / "a.txt").read_bytes() == b"abXYef"
+
+
+def test_text_upload_without_checksum(workdir):
+    protocol = FileProtocol()
+    hasil = protocol.proses_request(f"UPLOAD a.txt {base64.b64encode(b'isi').decode()}")
+    assert hasil['status'] == 'OK', hasil
+    assert hasil['sha256'] == hashlib.sha256(b"isi").hexdigest()
+
+
+def test_text_upload_compressed(workdir):
+    protocol = FileProtocol()
+    isi = b"baris yang berulang\n" * 500
+    digest = hashlib.sha256(isi).hexdigest()
+    payload = base64.b64encode(zlib.compress(isi)).decode()
+
+    hasil = protocol.proses_request(f"UPLOAD a.txt sha256={digest} encoding=zlib {payload}")
+    assert hasil['status'] == 'OK', hasil
+    assert (workdir / "files" / "a.txt").read_bytes() == isi
+
+
+def test_binary_upload_compressed(workdir):
+    protocol = FileProtocol()
+    isi = b"baris yang berulang\n" * 500
+    hasil, _ = protocol.proses_binary("UPLOAD a.txt encoding=zlib", zlib.compress(isi))
+    assert hasil['status'] == 'OK', hasil
+    assert (workdir / "files" / "a.txt").read_bytes() == isi
+
+
+def test_upload_unknown_encoding(workdir):
+    protocol = FileProtocol()
+    hasil, _ = protocol.proses_binary("UPLOAD a.txt encoding=brotli", b"xx")
+    assert hasil['status'] == 'ERROR'
+    assert "encoding tidak didukung" in hasil['data']
+
+
+def test_get_with_accepted_encoding(workdir):
+    protocol = FileProtocol()
+    protocol.proses_binary("UPLOAD a.txt", b"isi")
+
+    hasil = protocol.proses_request("GET a.txt encoding=zlib")
+    assert hasil['status'] == 'OK', hasil
+    assert 'encoding' not in hasil
+    assert base64.b64decode(hasil['data_file']) == b"isi"
+
+    hasil, isifile = protocol.proses_binary("GET a.txt encoding=zlib")
+    assert hasil['status'] == 'OK' and isifile == b"isi"
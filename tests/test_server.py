@@ -0,0 +1,85 @@
+import json
+import socket
+import time
+
+import pytest
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def recv_response(sock):
+    data = b""
+    while not data.endswith(b"\r\n\r\n"):
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data)
+
+
+@pytest.fixture
+def server(workdir):
+    import file_server
+
+    def start(**kwargs):
+        svr = file_server.Server(ipaddress='127.0.0.1', port=free_port(), **kwargs)
+        svr.daemon = True
+        svr.start()
+        for _ in range(50):
+            try:
+                socket.create_connection(svr.ipinfo, timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        # koneksi percobaan di atas ikut memakai slot sebentar, tunggu sampai dilepas
+        time.sleep(0.2)
+        return svr
+    return start
+
+
+def test_busy_exactly_above_capacity(server):
+    svr = server(max_connections=1, accept_queue=1)
+    clients = []
+    try:
+        # client pertama dilayani
+        first = socket.create_connection(svr.ipinfo, timeout=5)
+        clients.append(first)
+        first.sendall(b"LIST\r\n\r\n")
+        assert recv_response(first)['status'] == 'OK'
+
+        # client kedua menunggu di antrean tanpa ditolak
+        second = socket.create_connection(svr.ipinfo, timeout=0.5)
+        clients.append(second)
+        time.sleep(0.2)
+        second.sendall(b"LIST\r\n\r\n")
+        with pytest.raises(socket.timeout):
+            second.recv(1)
+
+        # client ketiga melebihi slot + antrean dan langsung dibalas BUSY
+        third = socket.create_connection(svr.ipinfo, timeout=5)
+        clients.append(third)
+        assert recv_response(third)['status'] == 'BUSY'
+        assert svr.rejected == 1
+
+        # setelah client pertama selesai, client di antrean dilayani
+        first.close()
+        second.settimeout(5)
+        assert recv_response(second)['status'] == 'OK'
+    finally:
+        for sock in clients:
+            sock.close()
+
+
+def test_legacy_request_without_terminator(server):
+    svr = server()
+    with socket.create_connection(svr.ipinfo, timeout=5) as sock:
+        # client lama: perintah tanpa "\r\n\r\n", koneksi tetap terbuka menunggu balasan
+        sock.sendall(b"LIST")
+        assert recv_response(sock)['status'] == 'OK'
+        # request berikutnya dengan terminator tetap dilayani pada koneksi yang sama
+        sock.sendall(b"LIST\r\n\r\n")
+        assert recv_response(sock)['status'] == 'OK'
@@ -0,0 +1,39 @@
+import os
+
+from file_storage import DedupStorage
+
+
+def upload(storage, filename, data):
+    up = storage.open_upload(filename)
+    up.write(data)
+    up.commit()
+    return up
+
+
+def blob_entries(storage):
+    return [os.path.join(d, f) for d, _, files in os.walk(storage.blob_dir) for f in files]
+
+
+def test_dedup_reupload_same_content_then_delete(tmp_path):
+    storage = DedupStorage(str(tmp_path / "uploads"))
+    for _ in range(3):
+        upload(storage, "a.bin", b"isi yang sama")
+    # hanya blob-nya sendiri, tanpa link tmp-* yang tertinggal
+    assert len(blob_entries(storage)) == 1
+
+    storage.delete("a.bin")
+    assert blob_entries(storage) == []
+
+
+def test_dedup_link_existing_name_then_delete(tmp_path):
+    storage = DedupStorage(str(tmp_path / "uploads"))
+    up = upload(storage, "a.bin", b"isi")
+    upload(storage, "b.bin", b"isi")
+    storage.link("a.bin", up.digest)
+    storage.link("b.bin", up.digest)
+    assert len(blob_entries(storage)) == 1
+
+    storage.delete("a.bin")
+    assert len(blob_entries(storage)) == 1
+    storage.delete("b.bin")
+    assert blob_entries(storage) == []
@@ -0,0 +1,50 @@
+import base64
+import threading
+
+import pytest
+
+from file_stress_client import InteractiveStressTester
+
+ISI = bytes(range(256)) * 4
+RESPONSE = (b'{"status": "OK", "data_namafile": "a.bin", "data_file": "' + base64.b64encode(ISI)
+            + b'", "sha256": "x"}\r\n\r\n')
+MARKER = RESPONSE.index(b'"data_file":')
+
+
+class ChunkedSocket:
+    # socket palsu yang mengembalikan response dalam potongan yang sudah ditentukan
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, view):
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        view[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def make_tester():
+    t = InteractiveStressTester.__new__(InteractiveStressTester)
+    t._local = threading.local()
+    return t
+
+
+def splits():
+    # batas recv di setiap byte di sekitar marker sampai sesudah tanda kutip pembuka isi base64
+    for cut in range(MARKER - 2, MARKER + len(b'"data_file": "') + 3):
+        yield [RESPONSE[:cut], RESPONSE[cut:]]
+        yield [RESPONSE[:cut], RESPONSE[cut:cut + 1], RESPONSE[cut + 1:]]
+
+
+@pytest.mark.parametrize("chunks", list(splits()))
+def test_receive_text_split_around_marker(chunks, tmp_path):
+    result = make_tester()._receive_text(ChunkedSocket(chunks))
+    assert result['status'] == 'OK'
+    assert base64.b64decode(result['data_file']) == ISI
+
+    sink = tmp_path / "a.bin"
+    result = make_tester()._receive_text(ChunkedSocket(chunks), str(sink))
+    assert result['payload_size'] == len(ISI)
+    assert result['sha256'] == "x"
+    assert sink.read_bytes() == ISI
@@ -0,0 +1,42 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from test_cluster import ROOT, free_port, request, wait_ready
+
+
+@pytest.fixture
+def server(tmp_path):
+    node = f"127.0.0.1:{free_port()}"
+    env = dict(os.environ, cluster_nodes="")
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "file_stress_server.py"), "--mode", "thread", "--workers", "4",
+         "--port", node.rpartition(":")[2], "--metrics-port", "0"],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(node)
+        yield node, tmp_path / "files" / "uploads"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_batch_uses_upload_storage(server):
+    node, uploads = server
+    meta, _ = request(node, "UPLOAD t.bin", b"isi file")
+    assert meta["status"] == "OK", meta
+
+    daftar = ["SIZE t.bin", "#2 GET t.bin", "UPLOAD u.bin " + base64.b64encode(b"baru").decode(), "DELETE t.bin"]
+    meta, _ = request(node, "BATCH " + json.dumps(daftar))
+    assert meta["status"] == "OK", meta
+    size, get, upload, delete = meta["data"]
+    assert size["status"] == "OK" and size["size"] == len(b"isi file"), size
+    assert get["id"] == "2" and base64.b64decode(get["data_file"]) == b"isi file", get
+    assert upload["status"] == "OK", upload
+    assert delete["status"] == "OK", delete
+    assert not (uploads / "t.bin").exists()
+    assert (uploads / "u.bin").read_bytes() == b"baru"